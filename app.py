@@ -1,9 +1,34 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, send_file
-from gemini_helper import query_gemini
-from retriever import index_documents, get_similar_doc
-from transcriber import transcribe_audio
-from pdf_generator import generate_medical_report_pdf, cleanup_old_reports
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, send_file, stream_with_context, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from gemini_helper import query_gemini, get_client
+from prompt_builder import build_prompt
+from tokens import estimate_tokens
+from retriever import index_documents, get_similar_docs, get_model
+from transcriber import transcribe_audio, NoSpeechError
+from stt_backends import get_backend
+from pdf_generator import (
+    generate_medical_report_pdf, generate_medical_report_pdf_bytes, generate_medical_report_pdfs, cleanup_old_reports,
+)
+from jobs import JobManager, JobError, FINISHED
+from session_store import make_session_store, MemorySessionStore
+from upload_store import ChunkedUploadStore, UploadError
+from metrics import observe, collect_spans, server_timing, register_collector
+import metrics
+from config import (
+    JOB_WORKERS, JOB_TTL_SECONDS, JOB_STORE_PATH, GEMINI_STREAM, WARMUP_ON_START,
+    SESSION_STORE, SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES, SESSION_DB_PATH, REDIS_URL, SERVER_TIMING,
+    ADMIN_TOKEN, UPLOAD_DIR, UPLOAD_TTL_SECONDS, UPLOAD_MAX_BYTES, PDF_CACHE_TTL_SECONDS, PDF_CACHE_MAX_ENTRIES,
+)
+import retriever
+import gemini_helper
+import io
 import os
+import re
+import hashlib
+import hmac
+import time
+import threading
+import uuid
 import logging
 import json
 
@@ -12,26 +37,159 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# Bounds every request body, so a chunk or /upload is rejected before it is read in full
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES
+jobs = JobManager(max_workers=JOB_WORKERS, ttl_seconds=JOB_TTL_SECONDS, shared_path=JOB_STORE_PATH or None)
+sessions = make_session_store(SESSION_STORE, SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES, SESSION_DB_PATH, REDIS_URL)
+# Streamed PDFs, kept briefly in this worker's memory so GET /reports/<filename> can revalidate and resume them
+rendered_pdfs = MemorySessionStore(PDF_CACHE_TTL_SECONDS, PDF_CACHE_MAX_ENTRIES)
+uploads = ChunkedUploadStore(UPLOAD_DIR, UPLOAD_TTL_SECONDS, UPLOAD_MAX_BYTES)
 
-# Initialize document index
-try:
-    index_documents()
-    logger.info("Document indexing completed successfully")
-    # Clean up old reports on startup
-    cleanup_old_reports()
-except Exception as e:
-    logger.error(f"Error indexing documents: {e}")
+@register_collector
+def component_gauges():
+    # Point-in-time state of the job pool, caches and LLM client for /metrics
+    gauges = {f"med_assistant_jobs_{k}": v for k, v in jobs.occupancy().items()}
+    gauges.update({f"med_assistant_embedding_{k}": v for k, v in retriever.query_embedder.stats().items()})
+    gauges.update({f"med_assistant_llm_cache_{k}": v for k, v in gemini_helper.response_cache.stats().items()})
+    if gemini_helper.client is not None:
+        gauges.update({f"med_assistant_llm_{k}": v for k, v in gemini_helper.client.stats().items()})
+    if retriever.snapshot is not None:
+        gauges["med_assistant_index_passages"] = len(retriever.snapshot.passages)
+        gauges["med_assistant_index_loaded_timestamp_seconds"] = retriever.snapshot.loaded_at
+    gauges["med_assistant_index_reindex_running"] = int(retriever.reindex_state['running'])
+    return gauges
+
+SSE_HEARTBEAT_SECONDS = 15
+
+# Models and the document index load lazily on first use. warm_up() loads them
+# ahead of time, in a background thread so the server can accept connections meanwhile.
+warmup_state = {'running': False, 'finished': None, 'error': None}
+_warmup_lock = threading.Lock()
+
+def warm_up():
+    """
+    Load the embedding model, document index, Gemini client and speech backend
+    """
+    start = time.time()
+    try:
+        index_documents()
+        logger.info("Document indexing completed successfully")
+        get_model()
+        get_client()
+        get_backend().warm_up()
+        # Clean up old reports on startup
+        cleanup_old_reports()
+        warmup_state.update(finished=time.time(), error=None)
+        logger.info(f"Warm-up finished in {time.time() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Error during warm-up: {e}")
+        warmup_state['error'] = str(e)
+    finally:
+        warmup_state['running'] = False
+
+def start_warmup():
+    """
+    Run warm_up() in a background thread unless it is running or already succeeded
+    """
+    with _warmup_lock:
+        if warmup_state['running'] or warmup_state['finished']:
+            return
+        warmup_state['running'] = True
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 @app.route("/", methods=["GET"])
 def home():
     return render_template("index.html")
 
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process is up and serving, whether or not models are loaded
+    return jsonify({'status': 'ok'})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    # Readiness: models and index are loaded. Probing also kicks off warm-up if nobody has.
+    ready = warmup_state['finished'] is not None and retriever.is_ready()
+    if not ready:
+        start_warmup()
+    body = {'ready': ready, 'warming_up': warmup_state['running'], 'error': warmup_state['error']}
+    return jsonify(body), 200 if ready else 503
+
 @app.route("/favicon.ico")
 def favicon():
     # Return a simple favicon response to prevent 404 errors
     return send_from_directory(os.path.join(app.root_path, 'static'), 
                              'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+SESSION_ID_RE = re.compile(r"^[0-9]{8}_[0-9]{6}_[0-9a-f]{32}$")
+REPORT_FILENAME_RE = re.compile(r"^medical_report_[0-9]{8}_[0-9]{6}_[0-9a-f]{12}\.pdf$")
+
+def new_session_id():
+    """
+    Timestamp-prefixed for readability, random-suffixed so ids never collide
+    """
+    from datetime import datetime
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}"
+
+def process_consultation(job, audio_bytes, mime_type):
+    """
+    Background job: uploaded audio -> transcript -> retrieval -> Gemini report
+    """
+    spans = collect_spans()  # stage timings, returned to the client as Server-Timing
+    start = time.perf_counter()
+
+    # Transcribe audio (doctor-patient conversation)
+    job.set_stage("converting")
+    try:
+        conversation = transcribe_audio(audio_bytes, mime_type, on_stage=job.set_stage)
+    except NoSpeechError:
+        conversation = ""
+    logger.info(f"Transcribed conversation ({len(conversation)} characters)")
+
+    if not conversation or conversation.strip() == "":
+        raise JobError("Could not understand the audio. Please try speaking more clearly.", 400)
+
+    # Get relevant medical passages for context
+    job.set_stage("retrieving")
+    passages = get_similar_docs(conversation)
+    logger.info(f"Retrieved {len(passages)} relevant medical passages")
+
+    # Generate prescription and report with Gemini, streaming chunks to the client
+    job.set_stage("generating")
+    prompt, prompt_tokens = build_prompt(conversation, passages)
+    result = query_gemini(prompt, on_chunk=job.emit if GEMINI_STREAM else None)
+    logger.info(f"Generated prescription and report with Gemini "
+                f"(prompt tokens {prompt_tokens}, response ~{estimate_tokens(result)} tokens)")
+
+    # Store conversation and result for PDF generation (the id carries the creation time)
+    session_id = new_session_id()
+    sessions.put(session_id, {
+        'conversation': conversation,
+        'medical_report': result,
+    })
+
+    observe("consultation", time.perf_counter() - start)
+    return {
+        'report': result,
+        'session_id': session_id,
+        'timings': spans
+    }
+
+def job_response(job):
+    body = {
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'stage': job['stage'],
+    }
+    if job['status'] == 'done':
+        body.update(success=True, **{k: v for k, v in job['result'].items() if k != 'timings'})
+    elif job['status'] == 'failed':
+        # The status code the failure would have had as a synchronous response (e.g. 400 for unintelligible audio)
+        body.update(success=False, error=job['error'], http_status=job['http_status'])
+    elif job['output']:
+        body['partial_report'] = "".join(job['output'])
+    return body
+
 @app.route("/upload", methods=["POST"])
 def upload_audio():
     try:
@@ -43,114 +201,153 @@ def upload_audio():
         if audio.filename == '':
             logger.warning("Empty filename in request")
             return "No file selected", 400
-            
-        filepath = "temp_audio.wav"
-        audio.save(filepath)
-        logger.info(f"Audio file saved: {filepath}")
-
-        # Transcribe audio (doctor-patient conversation)
-        conversation = transcribe_audio(filepath)
-        logger.info(f"Transcribed conversation: {conversation}")
-        
-        if not conversation or conversation.strip() == "":
-            return "Could not understand the audio. Please try speaking more clearly.", 400
-        
-        # Get relevant medical document for context
-        doc_info = get_similar_doc(conversation)
-        logger.info("Retrieved relevant medical document")
-        
-        # Generate prescription and report with Gemini
-        prompt = f"""You are an AI medical assistant analyzing a doctor-patient conversation. Based on the conversation transcript, generate a comprehensive medical prescription and report.
 
-Doctor-Patient Conversation Transcript:
-{conversation}
+        # Kept in memory and decoded from there; nothing is written to disk
+        audio_bytes = audio.read()
+        logger.info(f"Received {len(audio_bytes)} bytes of {audio.mimetype or 'unknown'} audio")
+        return queue_consultation(audio_bytes, audio.mimetype)
 
-Relevant Medical Knowledge Base:
-{doc_info}
+    except RequestEntityTooLarge:
+        raise  # answered by the 413 handler
+    except Exception as e:
+        logger.error(f"Error queuing audio: {str(e)}")
+        return f"Error processing your request: {str(e)}", 500
 
-Please provide a structured response with the following sections:
+def queue_consultation(audio_bytes, mime_type):
+    job_id = jobs.submit(process_consultation, audio_bytes, mime_type)
+    logger.info(f"Queued job {job_id}")
 
-## MEDICAL REPORT
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id)
+    }), 202
 
-**Patient Summary:**
-[Brief summary of patient's condition based on the conversation]
+# Chunked, resumable alternative to /upload: the browser sends the recording
+# in pieces while it is still recording, so little is left to upload at the end.
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({'error': str(e), **e.details}), e.status
 
-**Chief Complaint:**
-[Main symptoms/concerns discussed]
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': 'Recording is too large'}), 413
 
-**Assessment:**
-[Medical assessment and diagnosis]
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    upload_id = uploads.create(body.get('mime_type'))
+    return jsonify({
+        'upload_id': upload_id,
+        'status_url': url_for('upload_status', upload_id=upload_id),
+        'complete_url': url_for('complete_upload', upload_id=upload_id),
+    }), 201
 
-**Clinical Notes:**
-[Additional observations and recommendations]
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    return jsonify(uploads.status(upload_id))
 
-## PRESCRIPTION
+@app.route("/uploads/<upload_id>/chunks/<int:index>", methods=["PUT"])
+def upload_chunk(upload_id, index):
+    return jsonify(uploads.put_chunk(upload_id, index, request.get_data()))
 
-**Medications Prescribed:**
-1. [Medicine name] - [Dosage] - [Frequency] - [Duration]
-2. [Continue for each medication]
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    try:
+        total_chunks = int(body.get('chunks', 0))
+    except (TypeError, ValueError):
+        raise UploadError("chunks must be the number of chunks sent")
+    audio_bytes, mime_type = uploads.complete(upload_id, total_chunks)
+    logger.info(f"Assembled {len(audio_bytes)} bytes of {mime_type or 'unknown'} audio from {total_chunks} chunks")
+    return queue_consultation(audio_bytes, mime_type)
 
-**Dietary Recommendations:**
-[Specific dietary advice]
+@app.before_request
+def start_request_spans():
+    collect_spans()
 
-**Lifestyle Modifications:**
-[Exercise, habits, precautions]
+@app.after_request
+def record_request(response):
+    metrics.requests_total.inc(endpoint=request.endpoint or "unknown", status=response.status_code)
+    spans = metrics.current_spans()
+    if SERVER_TIMING and spans and 'Server-Timing' not in response.headers:
+        response.headers['Server-Timing'] = server_timing(spans)
+    return response
 
-**Follow-up Instructions:**
-[When to return, monitoring requirements]
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-**Important Notes:**
-[Warnings, side effects, emergency contacts]
+@app.route("/admin/reindex", methods=["GET", "POST"])
+def admin_reindex():
+    """
+    POST embeds new or changed knowledge-base documents in the background and
+    swaps in the new index; GET reports progress. Only this worker reindexes
+    directly, the others pick the new index up through their watcher.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (set ADMIN_TOKEN)'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
 
----
-*This is a computer-generated report based on conversation analysis. Please verify all prescriptions with a licensed healthcare provider.*"""
+    started = retriever.reindex_in_background() if request.method == "POST" else False
+    snapshot = retriever.snapshot
+    body = dict(retriever.reindex_state, started_now=started,
+                passages=len(snapshot.passages) if snapshot else None,
+                loaded_at=snapshot.loaded_at if snapshot else None)
+    return jsonify(body), 202 if started else 200
 
-        result = query_gemini(prompt)
-        logger.info("Generated prescription and report with Gemini")
-        
-        # Store conversation and result for PDF generation
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        session_data = {
-            'conversation': conversation,
-            'medical_report': result,
-            'timestamp': timestamp
-        }
-        
-        # Store session data temporarily (in production, use proper session management)
-        session_file = f"temp_session_{timestamp}.json"
-        with open(session_file, 'w') as f:
-            json.dump(session_data, f)
-        
-        # Clean up temporary files
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            if os.path.exists("temp_converted.wav"):
-                os.remove("temp_converted.wav")
-            logger.info("Temporary files cleaned up successfully")
-        except Exception as cleanup_error:
-            logger.warning(f"Could not clean up temporary files: {cleanup_error}")
-        
-        # Return result with session data for PDF generation
-        return jsonify({
-            'success': True,
-            'report': result,
-            'session_id': timestamp
-        })
-        
-    except Exception as e:
-        logger.error(f"Error processing audio: {str(e)}")
-        # Clean up any temporary files in error case
-        try:
-            if os.path.exists("temp_audio.wav"):
-                os.remove("temp_audio.wav")
-            if os.path.exists("temp_converted.wav"):
-                os.remove("temp_converted.wav")
-            logger.info("Temporary files cleaned up after error")
-        except Exception as cleanup_error:
-            logger.warning(f"Could not clean up temporary files after error: {cleanup_error}")
-        return f"Error processing your request: {str(e)}", 500
+@app.route("/jobs", methods=["GET"])
+def job_occupancy():
+    return jsonify(jobs.occupancy())
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    response = jsonify(job_response(job))
+    if SERVER_TIMING and job['status'] == 'done' and job['result'].get('timings'):
+        response.headers['Server-Timing'] = server_timing(job['result']['timings'])
+    return response
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream(job):
+        sent_stage = None
+        sent_chunks = 0
+        while True:
+            # Streamed report text goes out as "chunk" events, progress as plain messages
+            for text in job['output'][sent_chunks:]:
+                yield f"event: chunk\ndata: {json.dumps({'text': text})}\n\n"
+            sent_chunks = len(job['output'])
+            if job['stage'] != sent_stage or job['status'] in FINISHED:
+                body = job_response(job)
+                body.pop('partial_report', None)
+                yield f"data: {json.dumps(body)}\n\n"
+                sent_stage = job['stage']
+            if job['status'] in FINISHED:
+                return
+            version = job['version']
+            while job is not None and job['version'] == version:
+                job = jobs.wait_for_change(job_id, version, timeout=SSE_HEARTBEAT_SECONDS)
+                if job is not None and job['version'] == version:
+                    yield ": keep-alive\n\n"
+            if job is None:
+                return
+
+    return Response(stream_with_context(stream(job)), mimetype="text/event-stream",
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route("/generate_pdf", methods=["POST"])
 def generate_pdf():
@@ -162,28 +359,41 @@ def generate_pdf():
         
         if not session_id:
             return jsonify({'error': 'No session ID provided'}), 400
+        if not isinstance(session_id, str) or not SESSION_ID_RE.match(session_id):
+            return jsonify({'error': 'Invalid session ID'}), 400
         
-        # Load session data
-        session_file = f"temp_session_{session_id}.json"
-        if not os.path.exists(session_file):
+        # Claim the session; it is put back if rendering fails
+        session_data = sessions.pop(session_id)
+        if session_data is None:
             return jsonify({'error': 'Session data not found'}), 404
         
-        with open(session_file, 'r') as f:
-            session_data = json.load(f)
-        
-        # Generate PDF
-        pdf_path = generate_medical_report_pdf(
-            session_data['conversation'],
-            session_data['medical_report'],
-            patient_name,
-            doctor_name
-        )
-        
-        # Clean up session file
         try:
-            os.remove(session_file)
-        except:
-            pass
+            if data.get('stream') or request.accept_mimetypes.best == 'application/pdf':
+                # Render in memory and return the PDF itself in this response
+                filename, pdf = generate_medical_report_pdf_bytes(
+                    session_data['conversation'],
+                    session_data['medical_report'],
+                    patient_name,
+                    doctor_name
+                )
+                etag = hashlib.sha256(pdf).hexdigest()
+                # The session is consumed, so revalidation and Range resumes go to GET /reports/<filename>
+                rendered_pdfs.put(filename, (pdf, etag))
+                response = send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=True,
+                                     download_name=filename, etag=etag, max_age=0)
+                response.headers['Content-Location'] = url_for('rendered_pdf', filename=filename)
+                return response
+
+            # Generate PDF
+            pdf_path = generate_medical_report_pdf(
+                session_data['conversation'],
+                session_data['medical_report'],
+                patient_name,
+                doctor_name
+            )
+        except Exception:
+            sessions.put(session_id, session_data)
+            raise
         
         return jsonify({
             'success': True,
@@ -195,6 +405,73 @@ def generate_pdf():
         logger.error(f"Error generating PDF: {str(e)}")
         return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
 
+@app.route("/generate_pdf_batch", methods=["POST"])
+def generate_pdf_batch():
+    """
+    Render the reports of many sessions in one call (e.g. an end-of-day export).
+    Body: {"sessions": [{"session_id": ..., "patient_name": ..., "doctor_name": ...}, ...]}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    sessions_requested = data.get('sessions')
+    if not isinstance(sessions_requested, list) or not sessions_requested:
+        return jsonify({'error': 'No sessions provided'}), 400
+
+    results = [None] * len(sessions_requested)
+    to_render = []  # (position in results, session data, report arguments)
+    for i, entry in enumerate(sessions_requested):
+        session_id = entry.get('session_id') if isinstance(entry, dict) else None
+        if not isinstance(session_id, str) or not SESSION_ID_RE.match(session_id):
+            results[i] = {'session_id': session_id, 'error': 'Invalid session ID'}
+            continue
+        session_data = sessions.pop(session_id)
+        if session_data is None:
+            results[i] = {'session_id': session_id, 'error': 'Session data not found'}
+            continue
+        to_render.append((i, session_data, {
+            'conversation_text': session_data['conversation'],
+            'medical_report': session_data['medical_report'],
+            'patient_name': entry.get('patient_name', 'Not Specified'),
+            'doctor_name': entry.get('doctor_name', 'Not Specified'),
+        }))
+
+    try:
+        rendered = generate_medical_report_pdfs([report for _, _, report in to_render])
+    except Exception as e:
+        # Nothing was rendered (e.g. the render pool is broken); don't lose the claimed sessions
+        logger.error(f"Error generating PDF batch: {str(e)}")
+        for i, session_data, _ in to_render:
+            sessions.put(sessions_requested[i]['session_id'], session_data)
+        return jsonify({'error': f'Failed to generate PDFs: {str(e)}'}), 500
+    for (i, session_data, _), outcome in zip(to_render, rendered):
+        session_id = sessions_requested[i]['session_id']
+        results[i] = {'session_id': session_id}
+        if 'pdf_path' in outcome:
+            results[i]['pdf_path'] = os.path.basename(outcome['pdf_path'])
+        else:
+            results[i]['error'] = outcome['error']
+            sessions.put(session_id, session_data)  # keep it for a retry
+
+    return jsonify({
+        'success': all('pdf_path' in r for r in results),
+        'results': results
+    })
+
+@app.route("/reports/<filename>", methods=["GET"])
+def rendered_pdf(filename):
+    """
+    A PDF streamed by /generate_pdf, for PDF_CACHE_TTL_SECONDS afterwards.
+    Answers If-None-Match with 304 and Range with 206. The PDF is kept in the
+    memory of the worker that rendered it; other workers answer 404.
+    """
+    cached = rendered_pdfs.get(filename) if REPORT_FILENAME_RE.match(filename) else None
+    if cached is None:
+        return jsonify({'error': 'Report not found or expired'}), 404
+    pdf, etag = cached
+    return send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=True,
+                     download_name=filename, etag=etag, conditional=True, max_age=0)
+
 @app.route("/download_pdf/<filename>")
 def download_pdf(filename):
     try:
@@ -204,7 +481,8 @@ def download_pdf(filename):
         if not os.path.exists(filepath):
             return "File not found", 404
         
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        # Conditional: answers If-None-Match / Range requests with 304 / 206
+        return send_file(filepath, as_attachment=True, download_name=filename, conditional=True, etag=True)
         
     except Exception as e:
         logger.error(f"Error downloading PDF: {str(e)}")
@@ -219,4 +497,7 @@ def internal_error(error):
     return "Internal server error", 500
 
 if __name__ == "__main__":
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if WARMUP_ON_START and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,112 @@
+"""
+Deterministic local stand-ins for external services, for benchmarks and manual testing.
+"""
+import time
+import hashlib
+import threading
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Mimics google.generativeai.GenerativeModel.generate_content.
+
+    The reply is derived from a hash of the prompt, so identical prompts get
+    identical answers. With stream=True it yields FakeChunk objects of
+    chunk_chars characters, sleeping first_token_delay before the first and
+    chunk_delay between the rest. The first fail_times calls raise fail_with,
+    to exercise retries and fallbacks.
+    """
+
+    def __init__(self, reply=None, chunk_chars=40, first_token_delay=0.0, chunk_delay=0.0,
+                 model_name="models/fake-gemini", fail_times=0, fail_with=TimeoutError):
+        self.reply = reply
+        self.chunk_chars = chunk_chars
+        self.first_token_delay = first_token_delay
+        self.chunk_delay = chunk_delay
+        self.model_name = model_name
+        self.fail_times = fail_times
+        self.fail_with = fail_with
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def render(self, prompt):
+        if self.reply is not None:
+            return self.reply
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return (
+            "## MEDICAL REPORT\n\n"
+            f"**Patient Summary:**\nFake summary {digest}.\n\n"
+            "**Assessment:**\nLikely viral infection.\n\n"
+            "## PRESCRIPTION\n\n"
+            "**Medications Prescribed:**\n"
+            "1. Paracetamol - 500mg - Twice daily - 3 days\n"
+            "2. Oral rehydration salts - 1 sachet - After each loose stool - 2 days\n\n"
+            "**Follow-up Instructions:**\nReturn if fever persists beyond 3 days.\n"
+        )
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            failing = self.calls <= self.fail_times
+        if failing:
+            raise self.fail_with(f"Injected failure {self.calls}/{self.fail_times}")
+        text = self.render(prompt)
+        if not stream:
+            time.sleep(self.first_token_delay + self.chunk_delay * (len(text) // self.chunk_chars))
+            return FakeChunk(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(text), self.chunk_chars):
+            if start:
+                time.sleep(self.chunk_delay)
+            yield FakeChunk(text[start:start + self.chunk_chars])
+
+
+class FakeRedis:
+    """
+    In-process stand-in for the subset of redis-py that RedisSessionStore
+    uses: set (with ex), get, getdel and delete. Values come back as bytes,
+    and keys expire lazily like in Redis.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def set(self, name, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[name] = (value, time.time() + ex if ex else None)
+        return True
+
+    def get(self, name):
+        with self._lock:
+            return self._live(name)
+
+    def getdel(self, name):
+        with self._lock:
+            value = self._live(name)
+            self._data.pop(name, None)
+            return value
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def _live(self, name):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < time.time():
+            del self._data[name]
+            return None
+        return value
@@ -0,0 +1,120 @@
+"""
+Per-worker memory of a gunicorn deployment, with and without preload_app.
+
+Starts gunicorn -c gunicorn.conf.py wsgi:app, waits for /readyz, then reads
+/proc/<pid>/smaps_rollup for the master and each worker. RSS counts shared
+pages in every process that maps them; PSS divides them between the sharers,
+so the PSS total is the real footprint of the deployment. With preload the
+model weights and the mmapped index show up as shared pages and the PSS total
+should grow far less than linearly with the worker count. Linux only.
+
+    python bench/memory_benchmark.py --workers 4 --compare --json mem.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.request
+import urllib.error
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid):
+    """
+    Memory fields of a process in MiB
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in FIELDS:
+                values[name] = int(rest.split()[0]) / 1024  # kB -> MiB
+    values["Shared"] = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    values["Private"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_ready(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(1)
+    raise SystemExit(f"{url} not ready after {timeout}s")
+
+
+def measure(workers, preload, port, timeout):
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PRELOAD_APP": "1" if preload else "0",
+           "BIND": f"127.0.0.1:{port}"}
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/readyz", process, timeout)
+        # Without preload each worker loads the models itself after it is forked;
+        # wait until every worker exists and their combined RSS stops growing
+        deadline = time.time() + timeout
+        previous = -1
+        while time.time() < deadline:
+            pids = children(process.pid)
+            rss = sum(smaps_rollup(pid)["Rss"] for pid in pids)
+            if len(pids) >= workers and abs(rss - previous) < 0.01 * rss:
+                break
+            previous = rss
+            time.sleep(2)
+        master = smaps_rollup(process.pid)
+        worker_stats = [dict(pid=pid, **smaps_rollup(pid)) for pid in children(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    total = {field: master[field] + sum(w[field] for w in worker_stats) for field in ("Rss", "Pss")}
+    return {"preload": preload, "workers": workers, "master": master, "worker_stats": worker_stats, "total": total}
+
+
+def report(result):
+    print(f"\npreload_app={result['preload']}, {result['workers']} workers (MiB)")
+    print(f"{'process':>10} {'RSS':>9} {'PSS':>9} {'shared':>9} {'private':>9}")
+    rows = [("master", result["master"])] + [(str(w["pid"]), w) for w in result["worker_stats"]]
+    for name, m in rows:
+        print(f"{name:>10} {m['Rss']:>9.1f} {m['Pss']:>9.1f} {m['Shared']:>9.1f} {m['Private']:>9.1f}")
+    print(f"{'total':>10} {result['total']['Rss']:>9.1f} {result['total']['Pss']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--timeout", type=int, default=300, help="seconds to wait for the app to become ready")
+    parser.add_argument("--no-preload", action="store_true", help="measure without preload_app")
+    parser.add_argument("--compare", action="store_true", help="measure both with and without preload_app")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    modes = [True, False] if args.compare else [not args.no_preload]
+    results = [measure(args.workers, preload, args.port, args.timeout) for preload in modes]
+    for result in results:
+        report(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+PDF report rendering throughput: one report at a time in-process versus the
+batch API on the PDF process pool (PDF_WORKERS processes).
+
+    PDF_WORKERS=4 python bench/pdf_benchmark.py --reports 200
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pdf_generator
+from config import PDF_WORKERS
+
+CONVERSATION = ("Doctor: What brings you in today? Patient: I've had a fever for three days, "
+                "a dry cough and some body aches. Doctor: Any shortness of breath? Patient: No. ") * 4
+
+REPORT = """## Symptoms Identified
+Fever for three days, dry cough, myalgia.
+
+## Possible Diagnosis
+Likely viral upper respiratory tract infection.
+
+**Prescription:**
+Paracetamol 500mg twice daily for 3 days.
+Plenty of fluids and rest.
+
+## Follow-up
+Return if fever persists beyond 3 days or breathing becomes difficult.
+""" * 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="pdf-bench-")
+    pdf_generator.REPORTS_DIR = out_dir
+    reports = [{"conversation_text": CONVERSATION, "medical_report": REPORT,
+                "patient_name": f"Patient {i}", "doctor_name": "Dr. Bench"} for i in range(args.reports)]
+    try:
+        start = time.perf_counter()
+        for i, r in enumerate(reports):
+            pdf_generator.render_report(os.path.join(out_dir, f"serial_{i}.pdf"), f"serial_{i}", r["conversation_text"],
+                                        r["medical_report"], r["patient_name"], r["doctor_name"])
+        serial = time.perf_counter() - start
+
+        pdf_generator.generate_medical_report_pdfs(reports[:1])  # start the pool's processes
+        start = time.perf_counter()
+        results = pdf_generator.generate_medical_report_pdfs(reports)
+        batch = time.perf_counter() - start
+        failed = sum("error" in r for r in results)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print(f"{args.reports} reports")
+    print(f"serial, in-process:          {serial:.2f}s ({args.reports / serial:.1f} reports/s)")
+    print(f"batch, {PDF_WORKERS} pool workers:       {batch:.2f}s ({args.reports / batch:.1f} reports/s), {failed} failed")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"reports": args.reports, "pdf_workers": PDF_WORKERS,
+                       "serial_seconds": serial, "batch_seconds": batch, "failed": failed}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
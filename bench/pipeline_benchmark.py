@@ -0,0 +1,248 @@
+"""
+Offline end-to-end benchmark of the consultation pipeline.
+
+Drives transcribe_audio -> index_documents / get_similar_docs ->
+build_prompt -> query_gemini -> PDF rendering with deterministic local fakes
+for Google STT and Gemini. The embedding model, FAISS, ffmpeg and ReportLab
+run for real. Inputs are synthetic:
+- speech-like audio clips (tone bursts separated by pauses), one per
+  --clip-seconds: 44.1 kHz stereo WAV by default, or with --clip-format opus
+  the 16 kHz mono 24 kbps Opus/WebM that static/recorder.js uploads
+- a medical_docs corpus of --docs files built from a fixed vocabulary
+
+Each consultation is timed per stage (the same stages /metrics reports) and
+end to end, at --concurrency parallel consultations. Prints throughput and
+p50/p95/p99 per stage. --json saves the results, and --compare prints the
+change against a previous run.
+
+    python bench/pipeline_benchmark.py --consultations 40 --concurrency 4 --json after.json --compare before.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import wave
+import random
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import retriever
+import pdf_generator
+from fakes import FakeGenerativeModel
+from llm_client import LLMClient
+from gemini_helper import query_gemini
+from prompt_builder import build_prompt
+from transcriber import transcribe_audio
+
+CLIP_RATE = 44100
+VOCABULARY = (
+    "fever cough headache nausea vomiting diarrhea rash fatigue dizziness chest pain shortness breath "
+    "abdominal cramps sore throat runny nose joint swelling back pain insomnia anxiety palpitations "
+    "hypertension diabetes asthma infection allergy dehydration migraine bronchitis gastritis anemia "
+    "paracetamol ibuprofen amoxicillin cetirizine omeprazole metformin salbutamol rehydration rest fluids "
+    "dosage twice daily three days follow up blood pressure temperature pulse oxygen saturation"
+).split()
+STAGES = ("decode", "stt", "embed", "faiss_search", "bm25_search", "llm_first_token", "llm", "pdf_render")
+
+
+def synthetic_clip(seconds, seed):
+    """
+    WAV bytes: 0.4-2 s tone bursts at speech-like levels separated by 0.3-0.8 s pauses
+    """
+    rng = random.Random(seed)
+    total = int(seconds * CLIP_RATE)
+    samples = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        burst = int(rng.uniform(0.4, 2.0) * CLIP_RATE)
+        t = np.arange(min(burst, total - position)) / CLIP_RATE
+        samples[position:position + len(t)] = 0.3 * np.sin(2 * np.pi * rng.uniform(120, 300) * t)
+        position += burst + int(rng.uniform(0.3, 0.8) * CLIP_RATE)
+    stereo = np.repeat((samples * 32767).astype(np.int16)[:, None], 2, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(CLIP_RATE)
+        wav.writeframes(stereo.tobytes())
+    return buffer.getvalue()
+
+
+def to_opus(wav_bytes):
+    # What the browser recorder produces: 16 kHz mono Opus in WebM
+    process = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+                              "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-f", "webm", "pipe:1"],
+                             input=wav_bytes, capture_output=True, check=True)
+    return process.stdout
+
+
+def synthetic_corpus(folder, docs, words_per_doc, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(docs):
+        text = " ".join(rng.choice(VOCABULARY) for _ in range(words_per_doc))
+        with open(os.path.join(folder, f"doc_{i:05d}.txt"), "w") as f:
+            f.write(text)
+
+
+def make_fake_recognizer(base_delay, per_second_delay):
+    """
+    Stand-in for Google STT: words derived from a hash of the audio, after a
+    delay that grows with the chunk's duration
+    """
+    def recognize(audio_data):
+        pcm = audio_data.get_raw_data()
+        seconds = len(pcm) / (audio_data.sample_rate * audio_data.sample_width)
+        time.sleep(base_delay + per_second_delay * seconds)
+        digest = hashlib.sha256(pcm).digest()
+        return " ".join(VOCABULARY[b % len(VOCABULARY)] for b in digest[:max(3, int(seconds * 2.5))])
+    return recognize
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ms = np.array(values) * 1000
+    return {"count": len(values), "mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)), "p99_ms": float(np.percentile(ms, 99))}
+
+
+def run_consultation(clip, mime_type, recognize, llm, use_cache):
+    if not use_cache:
+        # Clips repeat, so their transcripts would otherwise be embedded only once
+        retriever.query_embedder.clear()
+    spans = metrics.collect_spans()
+    start = time.perf_counter()
+    conversation = transcribe_audio(clip, mime_type, recognize=recognize)
+    passages = retriever.get_similar_docs(conversation)
+    prompt, _ = build_prompt(conversation, passages)
+    report = query_gemini(prompt, on_chunk=lambda text: None, llm=llm, use_cache=use_cache)
+    pdf_generator.generate_medical_report_pdf_bytes(conversation, report, "Bench Patient", "Dr. Bench", persist=False)
+    return time.perf_counter() - start, spans
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nchange vs {baseline_path} ({baseline.get('revision')}):")
+    print(f"{'stage':<16} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10} {'p95 change':>11}")
+    for stage, now in results["stages"].items():
+        before = baseline["stages"].get(stage)
+        if not now or not before:
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(f"{stage:<16} {before['p50_ms']:>11.1f} {now['p50_ms']:>10.1f} "
+              f"{before['p95_ms']:>11.1f} {now['p95_ms']:>10.1f} {change:>+10.1f}%")
+    before, now = baseline["throughput_per_second"], results["throughput_per_second"]
+    print(f"{'throughput':<16} {before:>11.2f} {now:>10.2f} consultations/s ({(now - before) / before * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--clip-seconds", type=float, nargs="+", default=[5, 30, 90],
+                        help="clip lengths; consultations cycle through them")
+    parser.add_argument("--clip-format", choices=("wav", "opus"), default="wav")
+    parser.add_argument("--docs", type=int, default=200, help="synthetic medical_docs files")
+    parser.add_argument("--doc-words", type=int, default=400)
+    parser.add_argument("--stt-delay", type=float, default=0.2, help="fake STT seconds per request")
+    parser.add_argument("--stt-delay-per-second", type=float, default=0.02, help="fake STT seconds per audio second")
+    parser.add_argument("--llm-first-token", type=float, default=0.5, help="fake Gemini seconds to first token")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.02, help="fake Gemini seconds between chunks")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="let the embedding and LLM response caches answer repeated clips")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    try:
+        run(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(args, workdir):
+    docs_dir, index_dir = os.path.join(workdir, "medical_docs"), os.path.join(workdir, "index_store")
+    synthetic_corpus(docs_dir, args.docs, args.doc_words)
+
+    start = time.perf_counter()
+    retriever.index_documents(docs_dir, index_dir)
+    index_seconds = time.perf_counter() - start
+    print(f"indexed {args.docs} docs ({len(retriever.snapshot.texts)} passages) in {index_seconds:.2f}s")
+
+    clips = [synthetic_clip(seconds, seed) for seed, seconds in enumerate(args.clip_seconds)]
+    mime_type = "audio/wav"
+    if args.clip_format == "opus":
+        clips, mime_type = [to_opus(clip) for clip in clips], "audio/webm"
+    clip_bytes = sum(len(clip) for clip in clips) / len(clips)
+    print(f"{args.clip_format} clips: {clip_bytes / 1024:.0f} KiB on average")
+    recognize = make_fake_recognizer(args.stt_delay, args.stt_delay_per_second)
+    llm = LLMClient(FakeGenerativeModel(first_token_delay=args.llm_first_token, chunk_delay=args.llm_chunk_delay),
+                    rate_per_second=0, max_in_flight=max(1, args.concurrency))
+
+    # One untimed consultation loads the embedding model and starts the PDF pool
+    run_consultation(clips[0], mime_type, recognize, llm, False)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        runs = list(pool.map(lambda i: run_consultation(clips[i % len(clips)], mime_type, recognize, llm, args.use_cache),
+                             range(args.consultations)))
+    wall = time.perf_counter() - start
+
+    by_stage = {stage: [] for stage in STAGES}
+    for _, spans in runs:
+        for stage, seconds in spans:
+            by_stage.setdefault(stage, []).append(seconds)
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "index_seconds": index_seconds,
+        "clip_bytes": clip_bytes,
+        "wall_seconds": wall,
+        "throughput_per_second": args.consultations / wall,
+        "stages": {stage: percentiles(values) for stage, values in by_stage.items()},
+        "end_to_end": percentiles([total for total, _ in runs]),
+    }
+
+    print(f"{args.consultations} consultations at concurrency {args.concurrency}: {wall:.2f}s, "
+          f"{results['throughput_per_second']:.2f} consultations/s")
+    print(f"{'stage':<16} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in list(results["stages"].items()) + [("end_to_end", results["end_to_end"])]:
+        if stats:
+            print(f"{stage:<16} {stats['count']:>6} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} "
+                  f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of the report markdown -> ReportLab flowables converter on
+large generated reports, against the previous line-scanning formatter.
+
+For each report size it times format_medical_report() alone and a full
+render into memory, and counts the rendered pages. The legacy formatter runs
+lists and tables together into one paragraph per section, so it draws fewer
+pages and its render time is not like for like. It also passes text to
+Paragraph unescaped, so with --malformed (stray <, &, an unclosed <br> and
+unbalanced **) it fails where the tokenizer does not.
+
+    python bench/report_format_benchmark.py --sections 10 50 200 --malformed
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+import pdf_generator
+
+
+def legacy_format_medical_report(report_text, normal_style, header_style):
+    # format_medical_report as it was before the single-pass tokenizer
+    elements = []
+    current_section = []
+    for line in report_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('##') or (line.startswith('**') and line.endswith(':**')):
+            if current_section:
+                section_text = '\n'.join(current_section)
+                if section_text.strip():
+                    elements.append(Paragraph(section_text, normal_style))
+                current_section = []
+            header_text = line.replace('##', '').replace('**', '').replace(':', '').strip()
+            elements.append(Paragraph(header_text, header_style))
+        else:
+            current_section.append(line)
+    if current_section:
+        section_text = '\n'.join(current_section)
+        if section_text.strip():
+            elements.append(Paragraph(section_text, normal_style))
+    return elements
+
+
+def generate_report(sections, malformed=False):
+    noise = " Temp <38.5C & rising.<br>Take after food, **unbalanced" if malformed else ""
+    parts = []
+    for s in range(sections):
+        parts.append(f"## SECTION {s + 1}\n")
+        parts.append("**Patient Summary:**\nPatient reports **fever** and *mild* cough for three days." + noise + "\n")
+        parts.append("**Medications Prescribed:**")
+        parts.extend(f"{i}. Medicine{i} - {100 * i}mg - twice daily - {i + 2} days" for i in range(1, 6))
+        parts.append("\n**Lifestyle Modifications:**")
+        parts.extend(["- Rest", "- Fluids", "- Avoid cold drinks"])
+        parts.append("\n---\n")
+    return "\n".join(parts)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def render(formatter, report):
+    doc = SimpleDocTemplate(io.BytesIO())
+    doc.build(formatter(report, pdf_generator.NORMAL_STYLE, pdf_generator.HEADER_STYLE))
+    return doc.page
+
+
+def measure(name, formatter, report, repeat):
+    try:
+        format_ms = best_of(lambda: formatter(report, pdf_generator.NORMAL_STYLE, pdf_generator.HEADER_STYLE),
+                            repeat) * 1000
+        render_ms = best_of(lambda: render(formatter, report), max(1, repeat // 5)) * 1000
+        return {"formatter": name, "format_ms": format_ms, "render_ms": render_ms,
+                "pages": render(formatter, report)}
+    except Exception as e:
+        return {"formatter": name, "error": str(e).strip().splitlines()[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--malformed", action="store_true", help="add markup the legacy formatter cannot parse")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'sections':>8} {'KB':>7} {'formatter':>10} {'format ms':>10} {'render ms':>10} {'pages':>6}")
+    for sections in args.sections:
+        report = generate_report(sections, args.malformed)
+        for name, formatter in (("legacy", legacy_format_medical_report),
+                                ("tokenizer", pdf_generator.format_medical_report)):
+            result = {"sections": sections, "bytes": len(report), **measure(name, formatter, report, args.repeat)}
+            results.append(result)
+            if "error" in result:
+                print(f"{sections:>8} {len(report) / 1024:>7.1f} {name:>10}  failed: {result['error'][:60]}")
+            else:
+                print(f"{sections:>8} {len(report) / 1024:>7.1f} {name:>10} "
+                      f"{result['format_ms']:>10.2f} {result['render_ms']:>10.1f} {result['pages']:>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Recall-vs-latency benchmark for the FAISS backends in retriever.py.
+
+The flat inner-product index is the ground truth; every other backend is
+scored by recall@k against it. Vectors come from the built index_store/
+embeddings, or from a synthetic clustered corpus with --synthetic N.
+
+    python bench/retrieval_benchmark.py --synthetic 50000 --k 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import retriever
+from config import INDEX_DIR
+
+
+def synthetic_corpus(n, dim, clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(corpus, n, seed=1):
+    # Perturbed corpus vectors, so queries look like paraphrases of stored passages
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), n)] + 0.1 * rng.standard_normal((n, corpus.shape[1])).astype(np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def run_backend(index_type, corpus, queries, k):
+    start = time.perf_counter()
+    built = retriever.configure_search(retriever.make_index(corpus, index_type))
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    for row, q in enumerate(queries):
+        t0 = time.perf_counter()
+        _, found = built.search(q[None, :], k)
+        latencies.append(time.perf_counter() - t0)
+        ids[row] = found[0]
+    return type(built).__name__, build_seconds, np.array(latencies) * 1000, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of index_store/")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(retriever.INDEX_TYPES))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = synthetic_corpus(args.synthetic, retriever.EMBEDDING_DIM)
+    else:
+        corpus = np.array(np.load(os.path.join(INDEX_DIR, retriever.EMBEDDINGS_FILE)), dtype=np.float32)
+    queries = make_queries(corpus, args.queries)
+    k = min(args.k, len(corpus))
+
+    truth = None
+    results = []
+    print(f"{len(corpus)} vectors, {len(queries)} queries, k={k}")
+    print(f"{'backend':<10} {'index':<16} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for index_type in ["flat"] + [b for b in args.backends.split(",") if b != "flat"]:
+        name, build_seconds, latencies, ids = run_backend(index_type, corpus, queries, k)
+        if truth is None:
+            truth = ids
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, truth)])
+        row = {
+            "backend": index_type,
+            "index": name,
+            "build_seconds": build_seconds,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "recall_at_k": float(recall),
+        }
+        results.append(row)
+        print(f"{index_type:<10} {name:<16} {build_seconds:>8.2f} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {recall:>7.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"vectors": len(corpus), "queries": len(queries), "k": k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
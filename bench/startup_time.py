@@ -0,0 +1,78 @@
+"""
+Startup cost of the web app, from a fresh interpreter.
+
+Runs 'python -X importtime -c "import app"' and reports total import time
+plus the slowest modules by cumulative time. With --warmup it also times
+app.warm_up() (model, index, Gemini client and speech backend loading),
+which the server runs in the background after it starts accepting connections.
+
+    python bench/startup_time.py --top 15 --warmup
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WARMUP_SCRIPT = """
+import time
+import app
+start = time.perf_counter()
+app.warm_up()
+print(time.perf_counter() - start)
+"""
+
+
+def import_profile():
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                             cwd=ROOT, capture_output=True, text=True, env={**os.environ, "WARMUP_ON_START": "0"})
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise SystemExit(process.stderr)
+
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # importtime indents nested imports by two spaces per level after one leading space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                        "cumulative_ms": int(cumulative_us) / 1000, "depth": depth})
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warmup", action="store_true", help="also time app.warm_up()")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    wall, modules = import_profile()
+    app_import = next(m for m in modules if m["module"] == "app")
+    print(f"interpreter + import app: {wall:.2f}s wall, import app: {app_import['cumulative_ms']:.0f}ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for m in sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{m['cumulative_ms']:>14.1f} {m['self_ms']:>9.1f}  {'  ' * m['depth']}{m['module']}")
+
+    results = {"wall_seconds": wall, "import_app_ms": app_import["cumulative_ms"], "modules": modules}
+    if args.warmup:
+        process = subprocess.run([sys.executable, "-c", WARMUP_SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                                 env={**os.environ, "WARMUP_ON_START": "0"})
+        if process.returncode != 0:
+            raise SystemExit(process.stderr)
+        results["warmup_seconds"] = float(process.stdout.strip().splitlines()[-1])
+        print(f"warm_up(): {results['warmup_seconds']:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrency stress test for /upload and /generate_pdf.
+
+Fires many uploads in parallel at the Flask test client with the speech
+recognizer and Gemini stubbed out. Every upload carries a distinct tone
+that the stub recognizer turns into a distinct transcript, so each job's
+report, session and PDF can be checked against its own input. Exits
+non-zero on any cross-talk.
+
+    python bench/stress_upload.py --uploads 200 --concurrency 32
+"""
+import io
+import os
+import sys
+import wave
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import speech_recognition as sr
+import app as app_module
+import gemini_helper
+from fakes import FakeGenerativeModel
+from llm_client import LLMClient
+from transcriber import SAMPLE_RATE
+
+
+TONE_BASE = 1000  # keeps every clip well above the transcriber's silence floor
+
+
+def make_wav(patient_number, seconds=0.25):
+    # Constant-amplitude 16 kHz mono clip whose sample value encodes the patient number
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(struct.pack('<h', TONE_BASE + patient_number) * int(SAMPLE_RATE * seconds))
+    return buf.getvalue()
+
+
+def fake_recognize(recognizer, audio_data, language=None):
+    patient_number = struct.unpack('<h', audio_data.frame_data[:2])[0] - TONE_BASE
+    return f"patient number {patient_number} reports fever"
+
+
+class EchoModel(FakeGenerativeModel):
+    # Reply quotes the transcript line of the prompt, so reports can be traced to their upload
+    def render(self, prompt):
+        transcript = prompt.split("Transcript:\n", 1)[1].split("\n", 1)[0]
+        return f"## MEDICAL REPORT\n\n**Patient Summary:**\n{transcript}\n"
+
+
+def run_one(client, patient_number):
+    response = client.post("/upload", data={
+        "audio": (io.BytesIO(make_wav(patient_number)), "recording.wav", "audio/wav"),
+    })
+    if response.status_code != 202:
+        return f"{patient_number}: upload returned {response.status_code}"
+
+    events = client.get(response.get_json()["events_url"]).get_data(as_text=True)
+    if '"status": "done"' not in events:
+        return f"{patient_number}: job did not finish: {events[-300:]}"
+    job = client.get(response.get_json()["status_url"]).get_json()
+    expected = f"patient number {patient_number} "
+    if expected not in job["report"]:
+        return f"{patient_number}: got someone else's report: {job['report']!r}"
+
+    pdf = client.post("/generate_pdf", json={"session_id": job["session_id"], "patient_name": str(patient_number)})
+    if pdf.status_code != 200:
+        return f"{patient_number}: generate_pdf returned {pdf.status_code}: {pdf.get_data(as_text=True)}"
+    return pdf.get_json()["pdf_path"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    sr.Recognizer.recognize_google = fake_recognize
+    gemini_helper.client = LLMClient(EchoModel(), rate_per_second=0, max_in_flight=args.concurrency)
+    gemini_helper.response_cache.clear()
+    app_module.get_similar_docs = lambda query: []
+    client = app_module.app.test_client()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda n: run_one(client, n), range(1, args.uploads + 1)))
+
+    errors = [r for r in results if not r.endswith(".pdf")]
+    pdf_names = [r for r in results if r.endswith(".pdf")]
+    if len(set(pdf_names)) != len(pdf_names):
+        errors.append(f"{len(pdf_names) - len(set(pdf_names))} duplicate PDF names")
+
+    for name in pdf_names:
+        os.remove(os.path.join("reports", name))
+    for error in errors:
+        print(error)
+    print(f"{args.uploads} uploads at concurrency {args.concurrency}: {len(errors)} errors")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
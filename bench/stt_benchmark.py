@@ -0,0 +1,67 @@
+"""
+Real-time factor (processing seconds per second of audio) of each speech backend.
+
+Every clip is decoded once up front, so only recognition is timed. Model
+load time is reported separately from the warm per-clip runs.
+
+    python bench/stt_benchmark.py clips/*.wav --backends google,vosk,faster_whisper
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_recognition as sr
+from stt_backends import BACKENDS, get_backend
+from transcriber import SAMPLE_RATE, SAMPLE_WIDTH, decode_to_pcm, sniff_format, transcribe_pcm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="+", help="audio files in any format ffmpeg can read")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    clips = []
+    for path in args.clips:
+        with open(path, 'rb') as f:
+            data = f.read()
+        pcm = decode_to_pcm(data, sniff_format(data))
+        clips.append((os.path.basename(path), pcm, len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)))
+
+    results = []
+    print(f"{'backend':<16} {'clip':<28} {'audio s':>8} {'wall s':>8} {'RTF':>6}  text")
+    for name in args.backends.split(","):
+        backend = get_backend(name)
+        start = time.perf_counter()
+        try:
+            backend.warm_up()
+        except sr.RequestError as e:
+            print(f"{name:<16} skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+        print(f"{name:<16} model load {load_seconds:.2f}s")
+
+        for clip_name, pcm, audio_seconds in clips:
+            start = time.perf_counter()
+            try:
+                text = transcribe_pcm(pcm, backend.recognize)
+            except (sr.UnknownValueError, sr.RequestError) as e:
+                text = f"<{type(e).__name__}>"
+            wall = time.perf_counter() - start
+            rtf = wall / audio_seconds if audio_seconds else 0.0
+            results.append({"backend": name, "clip": clip_name, "audio_seconds": audio_seconds,
+                            "wall_seconds": wall, "rtf": rtf, "load_seconds": load_seconds, "text": text})
+            print(f"{name:<16} {clip_name[:28]:<28} {audio_seconds:>8.1f} {wall:>8.2f} {rtf:>6.2f}  {text[:40]}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import re
+import hashlib
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_key(text, namespace="", lowercase=False):
+    """
+    sha256 content address for text. Whitespace runs are collapsed (and case
+    folded when lowercase is set), so trivially different texts share a key;
+    namespace separates keys of different caches or models.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", text).strip()
+    if lowercase:
+        normalized = normalized.lower()
+    return hashlib.sha256(f"{namespace}\0{normalized}".encode("utf-8")).hexdigest()
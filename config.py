@@ -1,2 +1,118 @@
 import os
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
\ No newline at end of file
+import tempfile
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Knowledge base / retrieval
+MEDICAL_DOCS_DIR = os.getenv("MEDICAL_DOCS_DIR", "medical_docs")
+INDEX_DIR = os.getenv("INDEX_DIR", "index_store")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "120"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "30"))
+
+# FAISS backend: flat, ivf_flat, ivf_pq or hnsw (all inner product over normalized embeddings)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "64"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+PQ_M = int(os.getenv("PQ_M", "48"))
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Passages sent to the LLM per request
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_MAX_TOKENS = int(os.getenv("RETRIEVAL_MAX_TOKENS", "1500"))
+# hybrid fuses FAISS and BM25 rankings (reciprocal rank fusion over RETRIEVAL_CANDIDATES
+# from each); vector or lexical use one of them alone
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Seconds between checks of MEDICAL_DOCS_DIR for added or changed documents (0 disables the watcher)
+INDEX_WATCH_SECONDS = float(os.getenv("INDEX_WATCH_SECONDS", "30"))
+# Bearer token for POST /admin/reindex; the endpoint is disabled while unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Gemini prompt budget: token counter ("estimate" or "gemini", which calls count_tokens),
+# transcript and knowledge-base limits, and the minimum cosine similarity for a passage to be included
+PROMPT_TOKEN_COUNTER = os.getenv("PROMPT_TOKEN_COUNTER", "estimate")
+PROMPT_MAX_TRANSCRIPT_TOKENS = int(os.getenv("PROMPT_MAX_TRANSCRIPT_TOKENS", "4000"))
+PROMPT_MAX_CONTEXT_TOKENS = int(os.getenv("PROMPT_MAX_CONTEXT_TOKENS", str(RETRIEVAL_MAX_TOKENS)))
+PROMPT_MIN_PASSAGE_SCORE = float(os.getenv("PROMPT_MIN_PASSAGE_SCORE", "0.0"))
+
+# Query embedding micro-batching and cache
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+
+# Background /upload pipeline
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+# SQLite file shared by worker processes so any of them can report on any job (gunicorn.conf.py sets it)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+
+# Consultation results kept for /generate_pdf: memory (single process), sqlite or redis
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Recordings uploaded in chunks while recording (/uploads); the directory must be
+# shared by all workers on the host
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "med-assistant-uploads"))
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", "3600"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Processes rendering PDF reports (0 renders inside the request thread)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Also save PDFs that are streamed straight back to the client to reports/
+PDF_PERSIST_REPORTS = os.getenv("PDF_PERSIST_REPORTS", "0") == "1"
+# Streamed PDFs stay available from GET /reports/<filename> (revalidation, range resumes) this long.
+# They are kept in the memory of the worker that rendered them, never written to disk.
+PDF_CACHE_TTL_SECONDS = int(os.getenv("PDF_CACHE_TTL_SECONDS", "600"))
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "100"))
+
+# Stream Gemini output to the browser as it is generated
+GEMINI_STREAM = os.getenv("GEMINI_STREAM", "1") == "1"
+
+# Gemini response cache (LLM_CACHE_PATH set to a file enables the SQLite backend)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+# Gemini client resilience
+LLM_PRIMARY_MODEL = os.getenv("LLM_PRIMARY_MODEL", "gemini-1.5-flash")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gemini-1.5-pro")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+# Start a fallback-model request if the primary has not answered after this many seconds (unset = off)
+LLM_HEDGE_AFTER_SECONDS = float(os.environ["LLM_HEDGE_AFTER_SECONDS"]) if os.getenv("LLM_HEDGE_AFTER_SECONDS") else None
+
+# Long-recording transcription: split on silence, recognize chunks in parallel
+STT_MAX_CHUNK_SECONDS = float(os.getenv("STT_MAX_CHUNK_SECONDS", "30"))
+STT_MIN_CHUNK_SECONDS = float(os.getenv("STT_MIN_CHUNK_SECONDS", "5"))
+STT_MIN_SILENCE_MS = int(os.getenv("STT_MIN_SILENCE_MS", "400"))
+STT_SILENCE_OFFSET_DB = float(os.getenv("STT_SILENCE_OFFSET_DB", "16"))
+STT_WORKERS = int(os.getenv("STT_WORKERS", "4"))
+STT_RETRIES = int(os.getenv("STT_RETRIES", "2"))
+
+# Speech-to-text backend: google (network), vosk or faster_whisper (local, CPU)
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base.en")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+
+# Add a Server-Timing header with per-stage durations to responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+# Load models and the index in the background as soon as the server starts
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
@@ -0,0 +1,123 @@
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from cache_keys import content_key
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """
+    Micro-batches concurrent embedding requests into single encode calls.
+
+    Callers block in embed() while a background worker collects up to
+    max_batch_size queued texts, waiting at most max_wait_ms after the first
+    one, and encodes them together. Results are kept in a bounded LRU cache,
+    and identical texts already in flight share one encode.
+    """
+
+    def __init__(self, encode, max_batch_size=32, max_wait_ms=5, cache_size=1024):
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.encoded = 0
+        self.max_batch_seen = 0
+
+    def embed(self, text, timeout=None):
+        """
+        Return the embedding vector for text, encoding it in the next batch on a cache miss
+        """
+        key = content_key(text, lowercase=True)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            self.misses += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                self._queue.put((key, text, future))
+                self._ensure_worker()
+        return future.result(timeout)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "batches": self.batches,
+                "encoded": self.encoded,
+                "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "cached": len(self._cache),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _ensure_worker(self):
+        # Called with self._lock held
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        try:
+            vectors = self._encode([text for _, text, _ in batch])
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} failed: {e}")
+            with self._lock:
+                for key, _, _ in batch:
+                    self._pending.pop(key, None)
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.encoded += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for (key, _, _), vector in zip(batch, vectors):
+                vector.setflags(write=False)  # shared by every caller and the cache
+                self._cache[key] = vector
+                self._pending.pop(key, None)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(vector)
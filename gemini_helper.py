@@ -1,28 +1,93 @@
-import google.generativeai as genai
-from config import GOOGLE_API_KEY
+from config import (
+    GOOGLE_API_KEY, LLM_CACHE_ENABLED, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH,
+    LLM_PRIMARY_MODEL, LLM_FALLBACK_MODEL, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS, LLM_RATE_PER_SECOND, LLM_BURST,
+    LLM_MAX_IN_FLIGHT, LLM_HEDGE_AFTER_SECONDS,
+)
+from llm_client import LLMClient
+from response_cache import ResponseCache
+from metrics import timed, observe
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-genai.configure(api_key=GOOGLE_API_KEY)
+# Created on first use (or by the app's warm-up); importing the Gemini SDK pulls in grpc
+model = None
+fallback_model = None
+client = None
+_client_lock = threading.Lock()
 
-# Use the updated model name for Gemini 1.5
-try:
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    logger.info("Using gemini-1.5-flash model")
-except Exception as e:
-    logger.warning(f"Failed to load gemini-1.5-flash, trying gemini-1.5-pro: {e}")
-    try:
-        model = genai.GenerativeModel("gemini-1.5-pro")
-        logger.info("Using gemini-1.5-pro model")
-    except Exception as e2:
-        logger.error(f"Failed to load any Gemini model: {e2}")
-        raise
+def get_client():
+    """
+    The shared LLMClient around gemini-1.5-flash, with gemini-1.5-pro as fallback / hedge target
+    """
+    global model, fallback_model, client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GOOGLE_API_KEY)
+                model = genai.GenerativeModel(LLM_PRIMARY_MODEL)
+                fallback_model = genai.GenerativeModel(LLM_FALLBACK_MODEL) if LLM_FALLBACK_MODEL else None
+                logger.info(f"Using {LLM_PRIMARY_MODEL} model (fallback: {LLM_FALLBACK_MODEL or 'none'})")
+                client = LLMClient(
+                    model,
+                    fallback=fallback_model,
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    max_retries=LLM_MAX_RETRIES,
+                    backoff_base=LLM_BACKOFF_BASE_SECONDS,
+                    backoff_max=LLM_BACKOFF_MAX_SECONDS,
+                    rate_per_second=LLM_RATE_PER_SECOND,
+                    burst=LLM_BURST,
+                    max_in_flight=LLM_MAX_IN_FLIGHT,
+                    hedge_after=LLM_HEDGE_AFTER_SECONDS,
+                )
+    return client
+
+response_cache = ResponseCache(LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH or None)
+
+def query_gemini(prompt, on_chunk=None, llm=None, use_cache=LLM_CACHE_ENABLED):
+    """
+    Return the full Gemini response text.
+    If on_chunk is given the response is streamed and on_chunk is called with
+    each piece of text as it arrives (once with the whole text on a cache hit).
+    Identical prompts are answered from response_cache, and concurrent
+    identical prompts share a single Gemini call.
+    llm defaults to the module client; pass an LLMClient around a local fake model in tests.
+    """
+    llm = llm or get_client()
+    if not use_cache:
+        return _generate(prompt, on_chunk, llm)
 
-def query_gemini(prompt):
+    result, computed = response_cache.get_or_compute(
+        prompt, lambda: _generate(prompt, on_chunk, llm), namespace=llm.name
+    )
+    if not computed:
+        logger.info("Gemini response served from cache")
+        if on_chunk is not None:
+            on_chunk(result)
+    return result
+
+def _generate(prompt, on_chunk, llm):
+    if on_chunk is not None:
+        on_chunk = _first_token_timer(on_chunk)
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        with timed("llm"):
+            return llm.generate(prompt, on_chunk)
     except Exception as e:
         logger.error(f"Error querying Gemini: {e}")
         raise Exception(f"Failed to generate response from Gemini AI: {str(e)}")
+
+def _first_token_timer(on_chunk):
+    # Records time to the first streamed chunk as the llm_first_token stage
+    start = time.perf_counter()
+    first = [True]
+
+    def wrapper(text):
+        if first[0]:
+            first[0] = False
+            observe("llm_first_token", time.perf_counter() - start)
+        on_chunk(text)
+    return wrapper
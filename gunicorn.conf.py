@@ -0,0 +1,41 @@
+"""
+gunicorn settings for multi-worker deployments (see wsgi.py)
+
+Every setting can be overridden from the environment.
+"""
+import os
+import tempfile
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# Long consultations stream over SSE; don't let the arbiter kill those workers
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# Import the app (and warm up) once in the master, then fork: model weights and
+# the mmapped index are shared copy-on-write between the workers
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+
+# Split the CPU between workers instead of letting each torch/OpenMP pool
+# claim every core. These must be set before torch is imported, i.e. here.
+torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // workers))))
+os.environ.setdefault("OMP_NUM_THREADS", str(torch_threads))
+os.environ.setdefault("MKL_NUM_THREADS", str(torch_threads))
+# The tokenizers' Rust thread pool deadlocks if it was used before a fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+# Each worker has its own PDF render pool; size them so all pools together
+# stay within the CPUs instead of adding min(4, cpus) processes per worker
+os.environ.setdefault("PDF_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+# Jobs and sessions are created by one worker but read through any of them
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(tempfile.gettempdir(), "med-assistant-jobs.sqlite3"))
+os.environ.setdefault("SESSION_STORE", "sqlite")
+
+
+def post_fork(server, worker):
+    import sys
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(torch_threads)
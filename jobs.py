@@ -0,0 +1,207 @@
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("done", "failed")
+
+
+class JobError(Exception):
+    """
+    Expected pipeline failure; http_status is included in the failed job's status response
+    """
+
+    def __init__(self, message, http_status=500):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+class JobContext:
+    """
+    Handle passed to a running job function for reporting progress
+    """
+
+    def __init__(self, manager, job_id):
+        self._manager = manager
+        self.job_id = job_id
+
+    def set_stage(self, stage):
+        self._manager._update(self.job_id, stage=stage)
+
+    def emit(self, text):
+        """
+        Publish a piece of partial output (e.g. a streamed LLM chunk)
+        """
+        self._manager._append_output(self.job_id, text)
+
+
+class SharedJobTable:
+    """
+    Job snapshots in a SQLite file, so any worker process can answer status
+    and event requests for jobs running in another one
+    """
+
+    POLL_SECONDS = 0.2
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = LocalConnection(path)
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def save(self, job):
+        with self._connection() as db:
+            db.execute("INSERT OR REPLACE INTO jobs (job_id, data, updated) VALUES (?, ?, ?)",
+                       (job["job_id"], json.dumps(job), job["updated"]))
+
+    def load(self, job_id):
+        row = self._connection().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def wait_for_change(self, job_id, version, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.load(job_id)
+            if job is None or job["version"] != version:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(self.POLL_SECONDS)
+
+    def expire(self, before):
+        with self._connection() as db:
+            db.execute("DELETE FROM jobs WHERE updated < ?", (before,))
+
+
+class JobManager:
+    """
+    Runs pipeline functions on a thread pool and tracks their progress.
+
+    A job function is called as fn(job, *args) with a JobContext, and should
+    call job.set_stage("...") as it moves through the pipeline and job.emit()
+    for partial output. Every change bumps the job's version so waiters
+    (polling or SSE) can block until something new happens.
+
+    With shared_path set (needed when several worker processes serve the
+    app) every change is also written to a SharedJobTable, which lookups
+    fall back to for jobs owned by another process.
+    """
+
+    def __init__(self, max_workers=4, ttl_seconds=3600, shared_path=None):
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._changed = threading.Condition()
+        self._shared = SharedJobTable(shared_path) if shared_path else None
+
+    def submit(self, fn, *args):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._changed:
+            self._expire(now)
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stage": "queued",
+                "result": None,
+                "error": None,
+                "http_status": None,
+                "output": [],
+                "created": now,
+                "updated": now,
+                "version": 0,
+            }
+            self._publish(job_id)
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def get(self, job_id):
+        with self._changed:
+            job = self._snapshot(job_id)
+        if job is None and self._shared is not None:
+            job = self._shared.load(job_id)
+        return job
+
+    def wait_for_change(self, job_id, version, timeout=None):
+        """
+        Block until the job's version differs from version (or timeout), then return a snapshot
+        """
+        with self._changed:
+            if job_id in self._jobs or self._shared is None:
+                self._changed.wait_for(
+                    lambda: job_id not in self._jobs or self._jobs[job_id]["version"] != version,
+                    timeout=timeout,
+                )
+                return self._snapshot(job_id)
+        return self._shared.wait_for_change(job_id, version, timeout)
+
+    def occupancy(self):
+        with self._changed:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "workers": self.max_workers,
+            "running": statuses.count("running"),
+            "queued": statuses.count("queued"),
+        }
+
+    def _snapshot(self, job_id):
+        # Called with the lock held
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = dict(job)
+        snapshot["output"] = list(job["output"])
+        return snapshot
+
+    def _publish(self, job_id):
+        # Called with the lock held
+        if self._shared is not None:
+            self._shared.save(self._snapshot(job_id))
+
+    def _append_output(self, job_id, text):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["output"].append(text)
+            job["version"] += 1
+            self._publish(job_id)
+            self._changed.notify_all()
+
+    def _update(self, job_id, **fields):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated"] = time.time()
+            job["version"] += 1
+            self._publish(job_id)
+            self._changed.notify_all()
+
+    def _run(self, job_id, fn, args):
+        self._update(job_id, status="running")
+        try:
+            result = fn(JobContext(self, job_id), *args)
+            self._update(job_id, status="done", stage="done", result=result)
+        except JobError as e:
+            logger.warning(f"Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), http_status=e.http_status)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), http_status=500)
+
+    def _expire(self, now):
+        # Called with the lock held; drops finished jobs nobody collected
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in FINISHED and now - job["updated"] > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self._shared is not None:
+            self._shared.expire(now - self.ttl_seconds)
@@ -0,0 +1,84 @@
+import re
+import math
+from collections import Counter, defaultdict
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Function words carry no signal for BM25 and make up most postings
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our "
+    "she so than that the their them then there these they this to was we were what when which who will with "
+    "you your do does did can could should would been being also any all some very".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric terms of text, without stopwords and single characters
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def term_frequencies(text):
+    return dict(Counter(tokenize(text)))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over passages, as an inverted index of numpy posting arrays.
+
+    Built from per-passage term frequency dicts (see term_frequencies), which
+    build_index stores per file so unchanged documents are never re-tokenized.
+    """
+
+    def __init__(self, passage_terms, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(passage_terms)
+        lengths = np.array([sum(tf.values()) for tf in passage_terms], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+        # Per-passage part of the BM25 denominator, precomputed once
+        self._norm = k1 * (1 - b + b * lengths / avg_length)
+
+        postings = defaultdict(lambda: ([], []))
+        for row, tf in enumerate(passage_terms):
+            for term, count in tf.items():
+                rows, counts = postings[term]
+                rows.append(row)
+                counts.append(count)
+        self._postings = {}
+        for term, (rows, counts) in postings.items():
+            df = len(rows)
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            self._postings[term] = (np.array(rows, dtype=np.int64), np.array(counts, dtype=np.float32), idf)
+
+    def search(self, query, k):
+        """
+        Top-k passages for query as (scores, rows), best first; passages sharing no term are omitted
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, counts, idf = posting
+            scores[rows] += idf * counts * (self.k1 + 1) / (counts + self._norm[rows])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return scores[best], best
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked lists of ids: each id scores sum(1 / (k + rank)) over the lists it
+    appears in (rank starting at 1). Returns [(id, score)] best first.
+    """
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda pair: pair[1], reverse=True)
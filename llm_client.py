@@ -0,0 +1,173 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+_retryable_errors = None
+
+
+def is_retryable(error):
+    """
+    Transient failures worth retrying; anything else (bad request, auth, safety) is raised at once
+    """
+    global _retryable_errors
+    if _retryable_errors is None:
+        # Imported lazily: google.api_core pulls in grpc
+        from google.api_core import exceptions as api_exceptions
+        _retryable_errors = (
+            api_exceptions.TooManyRequests,
+            api_exceptions.ResourceExhausted,
+            api_exceptions.InternalServerError,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.DeadlineExceeded,
+            api_exceptions.GatewayTimeout,
+            TimeoutError,
+            ConnectionError,
+        )
+    return isinstance(error, _retryable_errors)
+
+
+class TokenBucket:
+    """
+    Allows rate calls per second on average, with bursts of up to capacity
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        if not self.rate:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            if deadline is not None and now + delay > deadline:
+                raise TimeoutError("Timed out waiting for the LLM rate limiter")
+            time.sleep(delay)
+
+
+class LLMClient:
+    """
+    Wraps Gemini-style models (anything with generate_content) with per-call
+    deadlines, retries with exponential backoff and full jitter, a token-bucket
+    rate limit and a cap on concurrent calls.
+
+    If a fallback model is given it is used once the primary exhausts its
+    retries. With hedge_after set, a non-streaming call also starts the
+    fallback when the primary has not answered within hedge_after seconds,
+    and returns whichever finishes first.
+    """
+
+    def __init__(self, primary, fallback=None, timeout=60, max_retries=3,
+                 backoff_base=0.5, backoff_max=8, rate_per_second=5, burst=10,
+                 max_in_flight=8, hedge_after=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=2 * max_in_flight, thread_name_prefix="llm-hedge")
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def name(self):
+        return getattr(self.primary, "model_name", type(self.primary).__name__)
+
+    def generate(self, prompt, on_chunk=None):
+        """
+        Return the response text. With on_chunk the response is streamed and
+        on_chunk receives each piece; a stream is only retried if nothing was emitted yet.
+        """
+        if on_chunk is None and self.fallback is not None and self.hedge_after is not None:
+            return self._hedged(prompt)
+
+        emitted = []
+        try:
+            return self._with_retries(self.primary, prompt, on_chunk, emitted)
+        except Exception as e:
+            if self.fallback is None or emitted or not is_retryable(e):
+                raise
+            logger.warning(f"Primary model failed ({e}), falling back to {getattr(self.fallback, 'model_name', 'fallback')}")
+            self._count("fallbacks")
+            return self._with_retries(self.fallback, prompt, on_chunk, emitted)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _with_retries(self, model, prompt, on_chunk, emitted):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._call(model, prompt, on_chunk, emitted)
+            except Exception as e:
+                if emitted or not is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning(f"LLM call failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                self._count("retries")
+                time.sleep(delay)
+
+    def _call(self, model, prompt, on_chunk, emitted):
+        self._bucket.acquire(timeout=self.timeout)
+        with self._slots:
+            self._count("calls")
+            request_options = {"timeout": self.timeout}
+            if on_chunk is None:
+                return model.generate_content(prompt, request_options=request_options).text
+
+            parts = []
+            for chunk in model.generate_content(prompt, stream=True, request_options=request_options):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # chunk without text parts (e.g. only a finish reason)
+                if text:
+                    parts.append(text)
+                    emitted.append(True)
+                    on_chunk(text)
+            return "".join(parts)
+
+    def _hedged(self, prompt):
+        primary = self._hedge_pool.submit(self._with_retries, self.primary, prompt, None, [])
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done and (primary.exception() is None or not is_retryable(primary.exception())):
+            return primary.result()
+
+        self._count("hedges")
+        backup = self._hedge_pool.submit(self._with_retries, self.fallback, prompt, None, [])
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower request keeps running; its result is discarded
+                    if future is backup:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = error or future.exception()
+        raise error
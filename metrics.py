@@ -0,0 +1,166 @@
+"""
+Minimal Prometheus-style metrics: stage latency histograms, error counters
+and gauges read from the app's components at scrape time.
+
+Values are per process; under gunicorn each worker reports its own.
+"""
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames + ("le",), key + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series[-2]}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_count{labels} {series[-2]}")
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+        return lines
+
+
+stage_seconds = Histogram("med_assistant_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+stage_errors = Counter("med_assistant_stage_errors_total", "Pipeline stage failures", ["stage"])
+requests_total = Counter("med_assistant_http_requests_total", "HTTP requests by endpoint and status",
+                         ["endpoint", "status"])
+
+_metrics = [stage_seconds, stage_errors, requests_total]
+_collectors = []
+_spans = contextvars.ContextVar("spans", default=None)
+
+
+def register_collector(fn):
+    """
+    fn() returns a dict of gauge name -> value, read on every scrape
+    """
+    _collectors.append(fn)
+    return fn
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block as stage: observed in stage_seconds, counted in stage_errors
+    if it raises, and added to the current span list (see collect_spans)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def observe(stage, seconds):
+    """
+    Record a duration measured elsewhere (e.g. time to first LLM token)
+    """
+    stage_seconds.observe(seconds, stage=stage)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+def collect_spans():
+    """
+    Start collecting timed() spans in the current context; returns the list they are appended to
+    """
+    spans = []
+    _spans.set(spans)
+    return spans
+
+
+def current_spans():
+    return _spans.get()
+
+
+def server_timing(spans):
+    """
+    Server-Timing header value for (stage, seconds) spans
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans)
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            gauges = collector()
+        except Exception as e:
+            logger.warning(f"Metrics collector failed: {e}")
+            continue
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
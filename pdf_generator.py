@@ -1,180 +1,473 @@
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import (
+    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListFlowable, ListItem, HRFlowable, Flowable,
+)
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from concurrent.futures import Future, ProcessPoolExecutor
+from config import PDF_WORKERS, PDF_PERSIST_REPORTS
+from metrics import timed, stage_errors
+import multiprocessing
+import io
+import threading
 import os
+import uuid
 import logging
 from datetime import datetime
+from xml.sax.saxutils import escape
 import re
 
 logger = logging.getLogger(__name__)
 
+REPORTS_DIR = "reports"
+
+# Styles and table styles are built once per process, not on every report
+_base_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_base_styles['Heading1'],
+    fontSize=16,
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    textColor=colors.darkblue
+)
+
+HEADER_STYLE = ParagraphStyle(
+    'CustomHeader',
+    parent=_base_styles['Heading2'],
+    fontSize=14,
+    spaceAfter=12,
+    spaceBefore=20,
+    textColor=colors.darkblue
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_base_styles['Normal'],
+    fontSize=11,
+    spaceAfter=12,
+    alignment=TA_JUSTIFY
+)
+
+DISCLAIMER_STYLE = ParagraphStyle(
+    'Disclaimer',
+    parent=_base_styles['Normal'],
+    fontSize=9,
+    textColor=colors.red,
+    alignment=TA_CENTER,
+    borderWidth=1,
+    borderColor=colors.red,
+    borderPadding=10
+)
+
+LABEL_STYLE = ParagraphStyle(
+    'CustomLabel',
+    parent=NORMAL_STYLE,
+    fontName='Helvetica-Bold',
+    spaceBefore=6,
+    spaceAfter=4,
+    alignment=TA_LEFT
+)
+
+LIST_ITEM_STYLE = ParagraphStyle(
+    'CustomListItem',
+    parent=NORMAL_STYLE,
+    spaceAfter=4,
+    alignment=TA_LEFT
+)
+
+TABLE_CELL_STYLE = ParagraphStyle(
+    'CustomTableCell',
+    parent=_base_styles['Normal'],
+    fontSize=10
+)
+
+MEDICATION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6)
+])
+
+HEADER_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+DISCLAIMER_TEXT = """
+<b>IMPORTANT DISCLAIMER:</b><br/>
+This report is computer-generated based on conversation analysis using AI technology. 
+It should NOT be considered as a substitute for professional medical advice, diagnosis, or treatment. 
+Please consult with a qualified healthcare provider for proper medical evaluation and treatment decisions.
+All prescriptions and recommendations must be verified by a licensed medical professional.
+"""
+
+# Layout is CPU-bound pure Python, so reports render in worker processes
+# instead of holding the GIL in the web worker. Created on first use.
+_render_pool = None
+_pool_lock = threading.Lock()
+
+def _get_render_pool():
+    global _render_pool
+    if _render_pool is None:
+        with _pool_lock:
+            if _render_pool is None:
+                # spawn, not fork: the web process has threads (and possibly torch) running
+                _render_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+def new_report_id():
+    """
+    Timestamp plus a random suffix, unique even within one second
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{timestamp}_{uuid.uuid4().hex[:12]}"
+
 def generate_medical_report_pdf(conversation_text, medical_report, patient_name=None, doctor_name=None):
     """
-    Generate a professional medical report PDF from conversation and analysis
+    Generate a professional medical report PDF from conversation and analysis.
+    Rendering runs on the PDF process pool (in-process if PDF_WORKERS is 0).
+    Returns the file path.
     """
     try:
-        # Create reports directory if it doesn't exist
-        reports_dir = "reports"
-        if not os.path.exists(reports_dir):
-            os.makedirs(reports_dir)
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"medical_report_{timestamp}.pdf"
-        filepath = os.path.join(reports_dir, filename)
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=A4, 
-                              rightMargin=72, leftMargin=72, 
-                              topMargin=72, bottomMargin=18)
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        
-        header_style = ParagraphStyle(
-            'CustomHeader',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12,
-            spaceBefore=20,
-            textColor=colors.darkblue
-        )
-        
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            spaceAfter=12,
-            alignment=TA_JUSTIFY
-        )
-        
-        # Title
-        title = Paragraph("MEDICAL CONSULTATION REPORT", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 20))
-        
-        # Header information table
-        current_date = datetime.now().strftime("%B %d, %Y")
-        current_time = datetime.now().strftime("%I:%M %p")
-        
-        header_data = [
-            ['Report Date:', current_date, 'Report Time:', current_time],
-            ['Patient Name:', patient_name or 'Not Specified', 'Doctor Name:', doctor_name or 'Not Specified'],
-            ['Report ID:', f'RPT-{timestamp}', 'Status:', 'Computer Generated']
-        ]
-        
-        header_table = Table(header_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(header_table)
-        elements.append(Spacer(1, 20))
-        
-        # Conversation Transcript Section
-        elements.append(Paragraph("CONVERSATION TRANSCRIPT", header_style))
-        elements.append(Paragraph(conversation_text, normal_style))
-        elements.append(Spacer(1, 20))
-        
-        # Medical Analysis Section
-        elements.append(Paragraph("MEDICAL ANALYSIS & PRESCRIPTION", header_style))
-        
-        # Parse and format the medical report
-        formatted_report = format_medical_report(medical_report, normal_style, header_style)
-        elements.extend(formatted_report)
-        
-        # Add disclaimer
-        elements.append(Spacer(1, 30))
-        disclaimer_style = ParagraphStyle(
-            'Disclaimer',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.red,
-            alignment=TA_CENTER,
-            borderWidth=1,
-            borderColor=colors.red,
-            borderPadding=10
-        )
-        
-        disclaimer_text = """
-        <b>IMPORTANT DISCLAIMER:</b><br/>
-        This report is computer-generated based on conversation analysis using AI technology. 
-        It should NOT be considered as a substitute for professional medical advice, diagnosis, or treatment. 
-        Please consult with a qualified healthcare provider for proper medical evaluation and treatment decisions.
-        All prescriptions and recommendations must be verified by a licensed medical professional.
-        """
-        
-        elements.append(Paragraph(disclaimer_text, disclaimer_style))
-        
-        # Build PDF
-        doc.build(elements)
-        logger.info(f"PDF report generated successfully: {filepath}")
-        
-        return filepath
-        
+        with timed("pdf_render"):
+            return _submit_file(conversation_text, medical_report, patient_name, doctor_name).result()
     except Exception as e:
         logger.error(f"Error generating PDF report: {e}")
         raise Exception(f"Failed to generate PDF report: {str(e)}")
 
-def format_medical_report(report_text, normal_style, header_style):
+def generate_medical_report_pdf_bytes(conversation_text, medical_report, patient_name=None, doctor_name=None,
+                                      persist=PDF_PERSIST_REPORTS):
     """
-    Format the medical report text into structured PDF elements
+    Render a report in memory for streaming straight back to the client.
+    Returns (filename, pdf bytes); the PDF is also saved to REPORTS_DIR under
+    filename when persist is true, so /download_pdf can serve it later.
+    """
+    report_id = new_report_id()
+    filename = f"medical_report_{report_id}.pdf"
+    try:
+        with timed("pdf_render"):
+            data = _submit(render_report_bytes, report_id, conversation_text, medical_report,
+                           patient_name, doctor_name).result()
+    except Exception as e:
+        logger.error(f"Error generating PDF report: {e}")
+        raise Exception(f"Failed to generate PDF report: {str(e)}")
+
+    if persist:
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        filepath = os.path.join(REPORTS_DIR, filename)
+        with open(filepath + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(filepath + ".tmp", filepath)
+    return filename, data
+
+def generate_medical_report_pdfs(reports):
+    """
+    Render many reports at once, spread over the PDF process pool.
+    reports is a list of dicts with conversation_text, medical_report and
+    optionally patient_name / doctor_name. Returns one dict per report, in
+    order, with either 'pdf_path' or 'error'.
+    """
+    with timed("pdf_batch"):
+        futures = [
+            _submit_file(r['conversation_text'], r['medical_report'], r.get('patient_name'), r.get('doctor_name'))
+            for r in reports
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append({'pdf_path': future.result()})
+            except Exception as e:
+                logger.error(f"Error generating PDF report: {e}")
+                stage_errors.inc(stage="pdf_render")
+                results.append({'error': f"Failed to generate PDF report: {str(e)}"})
+    logger.info(f"Batch rendered {sum('pdf_path' in r for r in results)}/{len(results)} PDF reports")
+    return results
+
+def _submit_file(conversation_text, medical_report, patient_name, doctor_name):
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_id = new_report_id()
+    filepath = os.path.join(REPORTS_DIR, f"medical_report_{report_id}.pdf")
+    return _submit(render_report, filepath, report_id, conversation_text, medical_report, patient_name, doctor_name)
+
+def _submit(fn, *args):
+    if PDF_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _get_render_pool().submit(fn, *args)
+
+def render_report_bytes(report_id, conversation_text, medical_report, patient_name=None, doctor_name=None):
     """
+    render_report() into memory; returns the PDF bytes
+    """
+    buffer = io.BytesIO()
+    render_report(buffer, report_id, conversation_text, medical_report, patient_name, doctor_name)
+    return buffer.getvalue()
+
+def render_report(target, report_id, conversation_text, medical_report, patient_name=None, doctor_name=None):
+    """
+    Lay out one report PDF and write it to target (a path or binary file
+    object); runs inside a pool worker. Returns target.
+    """
+    doc = SimpleDocTemplate(target, pagesize=A4, 
+                          rightMargin=72, leftMargin=72, 
+                          topMargin=72, bottomMargin=18)
+    
+    # Container for the 'Flowable' objects
     elements = []
     
-    # Split the report into sections
-    lines = report_text.split('\n')
-    current_section = []
+    # Title
+    elements.append(Paragraph("MEDICAL CONSULTATION REPORT", TITLE_STYLE))
+    elements.append(Spacer(1, 20))
+    
+    # Header information table
+    now = datetime.now()
+    current_date = now.strftime("%B %d, %Y")
+    current_time = now.strftime("%I:%M %p")
+    
+    header_data = [
+        ['Report Date:', current_date, 'Report Time:', current_time],
+        ['Patient Name:', patient_name or 'Not Specified', 'Doctor Name:', doctor_name or 'Not Specified'],
+        ['Report ID:', f'RPT-{report_id}', 'Status:', 'Computer Generated']
+    ]
+    
+    header_table = Table(header_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+    header_table.setStyle(HEADER_TABLE_STYLE)
+    
+    elements.append(header_table)
+    elements.append(Spacer(1, 20))
+    
+    # Conversation Transcript Section
+    elements.append(Paragraph("CONVERSATION TRANSCRIPT", HEADER_STYLE))
+    elements.append(Paragraph(escape(conversation_text), NORMAL_STYLE))
+    elements.append(Spacer(1, 20))
+    
+    # Medical Analysis Section
+    elements.append(Paragraph("MEDICAL ANALYSIS & PRESCRIPTION", HEADER_STYLE))
+    
+    # Parse and format the medical report
+    elements.extend(format_medical_report(medical_report))
+    
+    # Add disclaimer
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph(DISCLAIMER_TEXT, DISCLAIMER_STYLE))
     
-    for line in lines:
+    # Build PDF
+    doc.build(elements)
+    logger.info(f"PDF report generated successfully: RPT-{report_id}")
+    
+    return target
+
+# One pass over the report: each line is classified by a single precompiled
+# regex covering the markdown subset prompt_builder.INSTRUCTIONS asks Gemini for
+_LINE_RE = re.compile(r"""
+    ^(?:
+        (?P<rule>(?:-{3,}|\*{3,}|_{3,}))
+      | \#{1,6}\s*(?P<heading>.*?)\s*\#*
+      | \*\*(?P<label>[^*]+?)(?::\*\*|\*\*:|\*\*$)\s*(?P<label_text>.*)
+      | (?P<number>\d+)[.)]\s+(?P<item>.*)
+      | [-*\u2022]\s+(?P<bullet>.*)
+      | (?P<text>.*)
+    )$
+""", re.VERBOSE)
+
+# Inline emphasis, applied after escaping; unbalanced markers stay literal
+_INLINE_RE = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|(?<![*\w])\*(?=\S)([^*]+?)(?<=\S)\*(?![*\w])|`([^`]+)`")
+_ITEM_SPLIT_RE = re.compile(r"\s+[-\u2013\u2014]\s+")
+_MEDICATION_COLUMNS = ['Medication', 'Dosage', 'Frequency', 'Duration']
+_PLAIN_CELL_CHARS = 24  # fits a column without wrapping
+
+def _inline_sub(match):
+    bold, italic, code = match.groups()
+    if bold is not None:
+        return f"<b>{bold}</b>"
+    if italic is not None:
+        return f"<i>{italic}</i>"
+    return f'<font face="Courier">{code}</font>'
+
+def inline_markup(text):
+    """
+    Escape text for Paragraph and turn **bold**, *italic* and `code` into ReportLab markup
+    """
+    return _INLINE_RE.sub(_inline_sub, escape(text))
+
+def tokenize_report(report_text):
+    """
+    Classify each non-blank line of a markdown report.
+    Yields (kind, text, extra) with kind one of rule, heading, label, number,
+    bullet, text or blank; extra is the text after a label on the same line.
+    """
+    for line in report_text.splitlines():
         line = line.strip()
         if not line:
+            yield 'blank', '', None
             continue
-            
-        # Check if line is a header (starts with ## or **header:**)
-        if line.startswith('##') or (line.startswith('**') and line.endswith(':**')):
-            # Add previous section content
-            if current_section:
-                section_text = '\n'.join(current_section)
-                if section_text.strip():
-                    elements.append(Paragraph(section_text, normal_style))
-                current_section = []
-            
-            # Add header
-            header_text = line.replace('##', '').replace('**', '').replace(':', '').strip()
-            elements.append(Paragraph(header_text, header_style))
-            
+        match = _LINE_RE.match(line)
+        if match.group('rule') is not None:
+            yield 'rule', '', None
+        elif match.group('heading') is not None:
+            yield 'heading', match.group('heading'), None
+        elif match.group('label') is not None:
+            yield 'label', match.group('label').strip(), match.group('label_text')
+        elif match.group('number') is not None:
+            yield 'number', match.group('item'), None
+        elif match.group('bullet') is not None:
+            yield 'bullet', match.group('bullet'), None
         else:
-            current_section.append(line)
-    
-    # Add remaining content
-    if current_section:
-        section_text = '\n'.join(current_section)
-        if section_text.strip():
-            elements.append(Paragraph(section_text, normal_style))
-    
+            yield 'text', match.group('text'), None
+
+class _PlainLine(Flowable):
+    """
+    Text without markup, drawn straight onto the canvas when it fits on one
+    line. Paragraph parses its text even when there is nothing to parse;
+    text too wide for one line is handed to a Paragraph at wrap time.
+    """
+
+    def __init__(self, text, style):
+        super().__init__()
+        self.text = text
+        self.style = style
+        self._paragraph = None
+
+    def getSpaceBefore(self):
+        return self.style.spaceBefore
+
+    def getSpaceAfter(self):
+        return self.style.spaceAfter
+
+    def wrap(self, availWidth, availHeight):
+        style = self.style
+        width = availWidth - style.leftIndent - style.firstLineIndent - style.rightIndent
+        if self._paragraph is None and stringWidth(self.text, style.fontName, style.fontSize) > width:
+            self._paragraph = Paragraph(self.text, style)
+        if self._paragraph is not None:
+            return self._paragraph.wrap(availWidth, availHeight)
+        self.width, self.height = availWidth, style.leading
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        return self._paragraph.split(availWidth, availHeight) if self._paragraph is not None else []
+
+    def draw(self):
+        if self._paragraph is not None:
+            self._paragraph.drawOn(self.canv, 0, 0)
+            return
+        style = self.style
+        self.canv.setFont(style.fontName, style.fontSize)
+        self.canv.setFillColor(style.textColor)
+        self.canv.drawString(style.leftIndent + style.firstLineIndent, self.height - style.fontSize, self.text)
+
+def _text(text, style):
+    # Paragraph parsing dominates formatting cost; plain left-aligned text skips it
+    markup = inline_markup(text)
+    if markup == text and style.alignment in (TA_LEFT, TA_JUSTIFY):
+        return _PlainLine(text, style)
+    return Paragraph(markup, style)
+
+def _table_cell(text):
+    # Paragraph parsing dominates table cost; short plain cells are drawn as strings
+    markup = inline_markup(text)
+    if markup == text and len(text) <= _PLAIN_CELL_CHARS:
+        return text
+    return Paragraph(markup, TABLE_CELL_STYLE)
+
+def _medication_table(items):
+    # "Name - Dosage - Frequency - Duration" items become a table when they all split that way
+    rows = [_ITEM_SPLIT_RE.split(item, maxsplit=len(_MEDICATION_COLUMNS) - 1) for item in items]
+    if not all(len(row) >= 2 for row in rows):
+        return None
+    width = max(len(row) for row in rows)
+    data = [_MEDICATION_COLUMNS[:width]]
+    for row in rows:
+        data.append([_table_cell(cell) for cell in row] + [''] * (width - len(row)))
+    table = Table(data, colWidths=[6.5 * inch / width] * width, hAlign='LEFT', repeatRows=1)
+    table.setStyle(MEDICATION_TABLE_STYLE)
+    return table
+
+def format_medical_report(report_text, normal_style=NORMAL_STYLE, header_style=HEADER_STYLE):
+    """
+    Format the medical report text into structured PDF elements: headings,
+    bold labels, paragraphs, numbered / bulleted lists (the medication list
+    as a table) and horizontal rules. All text is escaped, so stray <, > or &
+    from the model never break Paragraph parsing.
+    """
+    elements = []
+    paragraph = []  # consecutive text lines
+    items = []  # consecutive list items
+    list_kind = None
+    label = None  # most recent label, to recognise the medication list
+
+    def flush_paragraph():
+        if paragraph:
+            elements.append(Paragraph(" ".join(paragraph), normal_style))
+            paragraph.clear()
+
+    def flush_list():
+        nonlocal list_kind
+        if not items:
+            return
+        table = None
+        if list_kind == 'number' and label and 'medication' in label.lower():
+            table = _medication_table(items)
+        if table is not None:
+            elements.append(table)
+            elements.append(Spacer(1, 8))
+        else:
+            elements.append(ListFlowable(
+                [ListItem(_text(item, LIST_ITEM_STYLE)) for item in items],
+                bulletType='1' if list_kind == 'number' else 'bullet',
+                start='1' if list_kind == 'number' else None,
+                leftIndent=18,
+            ))
+        items.clear()
+        list_kind = None
+
+    for kind, text, extra in tokenize_report(report_text):
+        if kind in ('number', 'bullet'):
+            flush_paragraph()
+            if list_kind not in (None, kind):
+                flush_list()
+            list_kind = kind
+            items.append(text)
+            continue
+        if kind == 'blank':
+            flush_paragraph()
+            continue
+
+        flush_list()
+        if kind == 'text':
+            paragraph.append(inline_markup(text))
+            continue
+        flush_paragraph()
+        if kind == 'heading':
+            label = None
+            if text:
+                elements.append(_text(text, header_style))
+        elif kind == 'label':
+            label = text
+            elements.append(_text(text, LABEL_STYLE))
+            if extra:
+                paragraph.append(inline_markup(extra))
+        elif kind == 'rule':
+            elements.append(HRFlowable(width='100%', thickness=0.5, color=colors.grey, spaceBefore=6, spaceAfter=6))
+
+    flush_list()
+    flush_paragraph()
     return elements
 
 def cleanup_old_reports(max_age_hours=24):
@@ -182,7 +475,7 @@ def cleanup_old_reports(max_age_hours=24):
     Clean up old report files to prevent disk space issues
     """
     try:
-        reports_dir = "reports"
+        reports_dir = REPORTS_DIR
         if not os.path.exists(reports_dir):
             return
         
@@ -0,0 +1,140 @@
+from config import (
+    PROMPT_TOKEN_COUNTER, PROMPT_MAX_TRANSCRIPT_TOKENS, PROMPT_MAX_CONTEXT_TOKENS, PROMPT_MIN_PASSAGE_SCORE,
+)
+from tokens import estimate_tokens
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Static instruction block. It comes first and never changes, so every prompt
+# shares the same prefix (reusable by Gemini's implicit prefix caching) and its
+# token count is computed only once.
+INSTRUCTIONS = """You are an AI medical assistant analyzing a doctor-patient conversation. Based on the conversation transcript below, generate a comprehensive medical prescription and report.
+
+Please provide a structured response with the following sections:
+
+## MEDICAL REPORT
+
+**Patient Summary:**
+[Brief summary of patient's condition based on the conversation]
+
+**Chief Complaint:**
+[Main symptoms/concerns discussed]
+
+**Assessment:**
+[Medical assessment and diagnosis]
+
+**Clinical Notes:**
+[Additional observations and recommendations]
+
+## PRESCRIPTION
+
+**Medications Prescribed:**
+1. [Medicine name] - [Dosage] - [Frequency] - [Duration]
+2. [Continue for each medication]
+
+**Dietary Recommendations:**
+[Specific dietary advice]
+
+**Lifestyle Modifications:**
+[Exercise, habits, precautions]
+
+**Follow-up Instructions:**
+[When to return, monitoring requirements]
+
+**Important Notes:**
+[Warnings, side effects, emergency contacts]
+
+---
+*This is a computer-generated report based on conversation analysis. Please verify all prescriptions with a licensed healthcare provider.*
+"""
+
+TRANSCRIPT_HEADER = "\nDoctor-Patient Conversation Transcript:\n"
+CONTEXT_HEADER = "\n\nRelevant Medical Knowledge Base:\n"
+OMITTED_MARKER = "\n[... {words} words of the conversation omitted ...]\n"
+
+
+def count_tokens(text):
+    """
+    Tokens in text, by Gemini's count_tokens when PROMPT_TOKEN_COUNTER is
+    "gemini" (one API call) and the local estimator otherwise or on error
+    """
+    if PROMPT_TOKEN_COUNTER == "gemini":
+        try:
+            from gemini_helper import get_client
+            return get_client().primary.count_tokens(text).total_tokens
+        except Exception as e:
+            logger.warning(f"count_tokens failed ({e}), using the local estimate")
+    return estimate_tokens(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _static_tokens(text):
+    return count_tokens(text)
+
+
+def truncate_transcript(transcript, max_tokens):
+    """
+    Fit transcript into max_tokens, keeping its beginning (presenting
+    complaint) and end (plan, instructions) and dropping the middle.
+    Returns (text, tokens, truncated).
+    """
+    tokens = count_tokens(transcript)
+    if max_tokens is None or tokens <= max_tokens:
+        return transcript, tokens, False
+
+    words = transcript.split()
+    keep = int(len(words) * max_tokens / tokens)
+    # The counter is only approximately linear in words; shrink until it fits
+    for _ in range(5):
+        head, tail = words[:keep // 2], words[len(words) - (keep - keep // 2):]
+        text = " ".join(head) + OMITTED_MARKER.format(words=len(words) - len(head) - len(tail)) + " ".join(tail)
+        tokens = count_tokens(text)
+        if tokens <= max_tokens or keep <= 1:
+            break
+        keep = int(keep * max_tokens / tokens * 0.95)
+    return text, tokens, True
+
+
+def select_passages(passages, max_tokens, min_score=PROMPT_MIN_PASSAGE_SCORE):
+    """
+    Highest-scoring passages that fit in max_tokens, best first. Passages
+    whose cosine similarity is known and below min_score are left out.
+    """
+    selected = []
+    used = 0
+    for passage in sorted(passages, key=lambda p: p["score"], reverse=True):
+        if passage.get("similarity") is not None and passage["similarity"] < min_score:
+            continue
+        tokens = count_tokens(passage["text"])
+        if max_tokens is not None and used + tokens > max_tokens:
+            continue
+        selected.append(passage)
+        used += tokens
+    return selected, used
+
+
+def build_prompt(conversation, passages, max_transcript_tokens=PROMPT_MAX_TRANSCRIPT_TOKENS,
+                 max_context_tokens=PROMPT_MAX_CONTEXT_TOKENS):
+    """
+    Assemble the Gemini prompt: the static instructions, then the (possibly
+    truncated) transcript, then the selected knowledge-base passages.
+    passages are get_similar_docs() results. Returns (prompt, token_counts).
+    """
+    transcript, transcript_tokens, truncated = truncate_transcript(conversation, max_transcript_tokens)
+    selected, context_tokens = select_passages(passages, max_context_tokens)
+    doc_info = "\n\n".join(f"[{p['file']}]\n{p['text']}" for p in selected)
+
+    prompt = INSTRUCTIONS + TRANSCRIPT_HEADER + transcript + CONTEXT_HEADER + doc_info
+    instruction_tokens = _static_tokens(INSTRUCTIONS + TRANSCRIPT_HEADER + CONTEXT_HEADER)
+    token_counts = {
+        "instructions": instruction_tokens,
+        "transcript": transcript_tokens,
+        "context": context_tokens,
+        "total": instruction_tokens + transcript_tokens + context_tokens,
+        "transcript_truncated": truncated,
+        "passages": len(selected),
+        "passages_dropped": len(passages) - len(selected),
+    }
+    return prompt, token_counts
@@ -0,0 +1,153 @@
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from tokens import estimate_tokens
+from cache_keys import content_key
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Prompt -> response cache with TTL and size-bounded LRU eviction.
+
+    Entries live in memory, or in a SQLite file when sqlite_path is given so
+    they survive restarts and are shared by workers on the same host.
+    get_or_compute() also coalesces concurrent misses for the same prompt into
+    a single call (single flight).
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=512, sqlite_path=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._memory = OrderedDict()
+        self.sqlite_path = sqlite_path
+        # None for the in-memory backend
+        self._connection = LocalConnection(sqlite_path) if sqlite_path else None
+        if self._connection is not None:
+            with self._connection() as db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+                )
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.tokens_saved = 0
+
+    def get_or_compute(self, prompt, compute, namespace=""):
+        """
+        Return (response, computed). compute() is only called when the prompt
+        is neither cached nor already being computed by another thread.
+        """
+        key = content_key(prompt, namespace)
+        with self._lock:
+            cached = self._get(key)
+            if cached is not None:
+                self.hits += 1
+                self.tokens_saved += estimate_tokens(prompt) + estimate_tokens(cached)
+                return cached, False
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            response = future.result()
+            with self._lock:
+                self.tokens_saved += estimate_tokens(prompt) + estimate_tokens(response)
+            return response, False
+
+        try:
+            response = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            with self._lock:
+                try:
+                    self._set(key, response)
+                except sqlite3.Error as e:
+                    # Still a good response; it just will not be served from the cache
+                    logger.warning(f"Could not cache response: {e}")
+        finally:
+            # Always released, or later identical prompts would wait on this future forever
+            with self._lock:
+                del self._inflight[key]
+        return response, True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                with self._connection() as db:
+                    db.execute("DELETE FROM responses")
+
+    # The methods below are called with self._lock held
+
+    def _get(self, key):
+        now = time.time()
+        if self._connection is None:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            response, created = entry
+            if now - created > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return response
+
+        with self._connection() as db:
+            row = db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _set(self, key, response):
+        now = time.time()
+        if self._connection is None:
+            self._memory[key] = (response, now)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+            return
+
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
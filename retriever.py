@@ -1,26 +1,563 @@
 import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from config import (
+    MEDICAL_DOCS_DIR, INDEX_DIR, EMBEDDING_MODEL, CHUNK_WORDS, CHUNK_OVERLAP_WORDS,
+    INDEX_TYPE, IVF_NLIST, IVF_NPROBE, PQ_M, PQ_NBITS,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    RETRIEVAL_TOP_K, RETRIEVAL_MAX_TOKENS, RETRIEVAL_MODE, RETRIEVAL_CANDIDATES, RRF_K, BM25_K1, BM25_B,
+    EMBED_BATCH_SIZE, EMBED_MAX_WAIT_MS, EMBED_CACHE_SIZE, INDEX_WATCH_SECONDS,
+)
+from embedding_service import EmbeddingService
+from lexical_index import BM25Index, term_frequencies, reciprocal_rank_fusion
+from tokens import estimate_tokens
+from metrics import timed
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-index = faiss.IndexFlatL2(384)
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within the process
+    fcntl = None
 
-doc_texts = []
-file_names = []
+logger = logging.getLogger(__name__)
 
-def index_documents(folder="medical_docs"):
-    global file_names
-    for fname in os.listdir(folder):
-        with open(os.path.join(folder, fname), 'r') as f:
-            text = f.read()
-            doc_texts.append(text)
-            file_names.append(fname)
+EMBEDDING_DIM = 384
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Files written to INDEX_DIR by build_index()
+INDEX_FILE = "faiss.index"
+EMBEDDINGS_FILE = "embeddings.npy"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_FILE = "lexical.json"
+BUILD_LOCK_FILE = ".build.lock"
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+# Loaded on first use (or by the app's warm-up), not at import time
+model = None
+_model_lock = threading.Lock()
+_model_loading = False
+
+
+class IndexSnapshot:
+    """
+    One loaded version of the document index. Never modified once created:
+    reindexing loads a new snapshot and swaps the module-level reference, so a
+    search that picked up a snapshot sees consistent passages until it finishes.
+    """
+
+    def __init__(self, index, lexical, passages, texts, folder, index_dir, source):
+        self.index = index
+        self.lexical = lexical
+        # One entry per passage, aligned with the rows of the FAISS index
+        self.passages = passages
+        self.texts = texts
+        self.folder = folder
+        self.index_dir = index_dir
+        # _source_signature() the snapshot was built from; the watcher reloads when it changes
+        self.source = source
+        self.loaded_at = time.time()
+
+
+snapshot = None
+_index_lock = threading.RLock()
+
+reindex_state = {'running': False, 'started': None, 'finished': None, 'error': None}
+_reindex_lock = threading.Lock()
+_watcher = None
+_watcher_lock = threading.Lock()
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """
+    Split text into overlapping passages of about chunk_words words.
+    Returns a list of (start, end) character offsets into text.
+    """
+    spans = [m.span() for m in _WORD_RE.finditer(text)]
+    if not spans:
+        return []
+
+    stride = max(1, chunk_words - overlap_words)
+    chunks = []
+    for first in range(0, len(spans), stride):
+        last = min(first + chunk_words, len(spans)) - 1
+        chunks.append((spans[first][0], spans[last][1]))
+        if last == len(spans) - 1:
+            break
+    return chunks
+
+
+def get_model():
+    """
+    The shared SentenceTransformer, imported and loaded on first call
+    """
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                # torch and sentence_transformers take seconds to import; keep them off the startup path
+                from sentence_transformers import SentenceTransformer
+                logger.info(f"Loading embedding model {EMBEDDING_MODEL}")
+                model = SentenceTransformer(EMBEDDING_MODEL)
+    return model
+
+
+def _start_model_load():
+    # Load the embedding model in the background while queries take the lexical path
+    global _model_loading
+    with _model_lock:
+        if model is not None or _model_loading:
+            return
+        _model_loading = True
+
+    def load():
+        global _model_loading
+        try:
+            get_model()
+        except Exception as e:
+            logger.error(f"Loading embedding model failed: {e}")
+        finally:
+            _model_loading = False
+
+    threading.Thread(target=load, name="embedding-model-load", daemon=True).start()
+
+
+def embed(texts):
+    """
+    Encode texts into L2-normalized float32 vectors, so inner product is cosine similarity
+    """
+    vectors = np.ascontiguousarray(get_model().encode(texts), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+# Shared by all request threads; batches concurrent queries into one embed() call
+query_embedder = EmbeddingService(embed, EMBED_BATCH_SIZE, EMBED_MAX_WAIT_MS, EMBED_CACHE_SIZE)
+
+
+def make_index(embeddings, index_type=INDEX_TYPE):
+    """
+    Create and train a FAISS inner-product index of the given type over embeddings.
+    Falls back to a flat index when the corpus is too small to train the requested one.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    n, dim = embeddings.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+    if index_type == "hnsw":
+        built = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        built.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        # Keep roughly 39+ training points per list, as FAISS recommends
+        nlist = min(IVF_NLIST, n // 39)
+        if nlist < 1 or (index_type == "ivf_pq" and n < 2 ** PQ_NBITS):
+            logger.warning(f"Only {n} passages, too few to train {index_type}; using flat index")
+            return make_index(embeddings, "flat")
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf_flat":
+            built = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            built = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS, metric)
+        built.train(embeddings)
+    else:
+        built = faiss.IndexFlatIP(dim)
+
+    built.add(embeddings)
+    return built
+
+
+def configure_search(loaded):
+    """
+    Apply query-time parameters (nprobe, efSearch) to a built or loaded index
+    """
+    if isinstance(loaded, faiss.IndexHNSW):
+        loaded.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        try:
+            faiss.extract_index_ivf(loaded).nprobe = IVF_NPROBE
+        except RuntimeError:
+            pass  # not an IVF index
+    return loaded
+
+
+def _index_settings():
+    # Any change here invalidates every stored embedding
+    return {
+        "model": EMBEDDING_MODEL,
+        "chunk_words": CHUNK_WORDS,
+        "chunk_overlap_words": CHUNK_OVERLAP_WORDS,
+        "normalized": True,
+    }
+
+
+def _read_docs(folder):
+    docs = {}
+    for fname in sorted(os.listdir(folder)):
+        path = os.path.join(folder, fname)
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                docs[fname] = f.read()
+    return docs
+
+
+def _load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read index manifest, rebuilding: {e}")
+        return None
+
+
+def _passages_fingerprint(passage_list):
+    # Ties lexical.json to the manifest it was written with
+    return hashlib.sha256(json.dumps(passage_list).encode("utf-8")).hexdigest()
+
+
+def _load_lexical(index_dir, passage_list):
+    """
+    Per-passage term frequencies stored with passage_list, or None if missing or stale
+    """
+    path = os.path.join(index_dir, LEXICAL_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            lexical = json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read lexical index, rebuilding: {e}")
+        return None
+    if lexical.get("fingerprint") != _passages_fingerprint(passage_list):
+        return None
+    return lexical["terms"]
+
+
+def _atomic_write(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def build_index(folder=MEDICAL_DOCS_DIR, index_dir=INDEX_DIR):
+    """
+    Build or incrementally update the on-disk passage index for folder.
+    Only files whose content hash changed since the last build are re-embedded.
+    Returns True if the index files were rewritten.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    settings = _index_settings()
+    manifest = _load_manifest(index_dir)
+    embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+    index_path = os.path.join(index_dir, INDEX_FILE)
+
+    old_files = {}
+    old_passages = []
+    old_embeddings = None
+    old_terms = None
+    if manifest and manifest.get("settings") == settings and os.path.exists(embeddings_path):
+        old_files = manifest.get("files", {})
+        old_passages = manifest.get("passages", [])
+        old_embeddings = np.load(embeddings_path, mmap_mode='r')
+        old_terms = _load_lexical(index_dir, old_passages)
+
+    docs = _read_docs(folder)
+    changed = (
+        set(old_files) != set(docs)
+        or not os.path.exists(index_path)
+        or (manifest or {}).get("index_type") != INDEX_TYPE
+        or old_terms is None
+    )
+    files = {}
+    new_passages = []
+    new_terms = []
+    blocks = []
+
+    for fname, text in docs.items():
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        previous = old_files.get(fname)
+        if previous and previous["sha256"] == digest:
+            start, end = previous["rows"]
+            spans = [(p["start"], p["end"]) for p in old_passages[start:end]]
+            block = np.array(old_embeddings[start:end], dtype=np.float32)
+            if old_terms is not None:
+                terms = old_terms[start:end]
+            else:
+                terms = [term_frequencies(text[s:e]) for s, e in spans]
+        else:
+            spans = chunk_text(text)
+            if spans:
+                block = embed([text[s:e] for s, e in spans])
+            else:
+                block = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            terms = [term_frequencies(text[s:e]) for s, e in spans]
+            logger.info(f"Embedded {len(spans)} passages from {fname}")
+            changed = True
+
+        row = len(new_passages)
+        files[fname] = {"sha256": digest, "rows": [row, row + len(spans)]}
+        new_passages.extend({"file": fname, "start": s, "end": e} for s, e in spans)
+        new_terms.extend(terms)
+        blocks.append(block)
+
+    if not changed:
+        logger.info("Document index is up to date")
+        return False
+
+    embeddings = np.vstack(blocks) if blocks else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    built_index = make_index(embeddings)
+
+    # Manifest goes last so a crashed build is simply redone on the next start
+    _atomic_write(embeddings_path, lambda f: np.save(f, embeddings))
+    faiss.write_index(built_index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    lexical = {"fingerprint": _passages_fingerprint(new_passages), "terms": new_terms}
+    _atomic_write(os.path.join(index_dir, LEXICAL_FILE), lambda f: f.write(json.dumps(lexical).encode("utf-8")))
+    new_manifest = {"settings": settings, "index_type": INDEX_TYPE, "files": files, "passages": new_passages}
+    _atomic_write(os.path.join(index_dir, MANIFEST_FILE),
+                  lambda f: f.write(json.dumps(new_manifest).encode("utf-8")))
+    logger.info(f"Wrote {INDEX_TYPE} index with {len(new_passages)} passages from {len(files)} documents to {index_dir}")
+    return True
+
+
+def load_index(folder=MEDICAL_DOCS_DIR, index_dir=INDEX_DIR):
+    """
+    Load a built index, memory-mapping the FAISS file so forked workers share its pages.
+    Returns (faiss_index, bm25_index, passages, passage_texts).
+    """
+    manifest = _load_manifest(index_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No document index found in {index_dir}")
+
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    try:
+        loaded = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except Exception as e:
+        logger.warning(f"Memory-mapped index load failed, reading into memory: {e}")
+        loaded = faiss.read_index(index_path)
+
+    docs = {}
+    texts = []
+    for p in manifest["passages"]:
+        if p["file"] not in docs:
+            with open(os.path.join(folder, p["file"]), 'r') as f:
+                docs[p["file"]] = f.read()
+        texts.append(docs[p["file"]][p["start"]:p["end"]])
+
+    terms = _load_lexical(index_dir, manifest["passages"])
+    if terms is None:
+        terms = [term_frequencies(text) for text in texts]
+    return configure_search(loaded), BM25Index(terms, BM25_K1, BM25_B), manifest["passages"], texts
+
+
+@contextmanager
+def _build_lock(index_dir):
+    # Worker processes share index_dir; only one of them may build at a time
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, BUILD_LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _source_signature(folder, index_dir):
+    """
+    Cheap fingerprint of the document folder (names, sizes, mtimes) and of the
+    manifest, which changes when another process rebuilds the index
+    """
+    docs = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                st = entry.stat()
+                docs.append((entry.name, st.st_size, st.st_mtime_ns))
+    docs.sort()
+    try:
+        manifest_mtime = os.stat(os.path.join(index_dir, MANIFEST_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        manifest_mtime = None
+    return tuple(docs), manifest_mtime
+
+
+def index_documents(folder=MEDICAL_DOCS_DIR, index_dir=INDEX_DIR):
+    """
+    Incrementally rebuild the index from folder and swap in the new snapshot.
+    Searches keep using the previous snapshot until the swap.
+    """
+    global snapshot
+    with _index_lock, _build_lock(index_dir):
+        docs_signature, _ = _source_signature(folder, index_dir)
+        build_index(folder, index_dir)
+        faiss_index, lexical, passage_list, texts = load_index(folder, index_dir)
+        _, manifest_mtime = _source_signature(folder, index_dir)
+        snapshot = IndexSnapshot(faiss_index, lexical, passage_list, texts, folder, index_dir,
+                                 (docs_signature, manifest_mtime))
+    logger.info(f"Loaded document index with {len(passage_list)} passages")
+    return snapshot
+
+
+def ensure_index():
+    """
+    Load the document index if startup warm-up has not done so yet. Returns the current snapshot.
+    """
+    current = snapshot
+    if current is None:
+        with _index_lock:
+            current = snapshot if snapshot is not None else index_documents()
+    if INDEX_WATCH_SECONDS > 0:
+        _ensure_watcher()
+    return current
+
+
+def _reindex(folder, index_dir):
+    try:
+        with timed("reindex"):
+            index_documents(folder, index_dir)
+        reindex_state.update(finished=time.time(), error=None)
+    except Exception as e:
+        logger.error(f"Reindexing failed, still serving the previous index: {e}")
+        reindex_state['error'] = str(e)
+    finally:
+        reindex_state['running'] = False
+
+
+def reindex_in_background(folder=None, index_dir=None):
+    """
+    Re-embed new or changed documents in a background thread, then swap in the
+    new index. Defaults to the folders of the current snapshot. Returns False if
+    a reindex is already running.
+    """
+    current = snapshot
+    folder = folder or (current.folder if current else MEDICAL_DOCS_DIR)
+    index_dir = index_dir or (current.index_dir if current else INDEX_DIR)
+    with _reindex_lock:
+        if reindex_state['running']:
+            return False
+        reindex_state.update(running=True, started=time.time())
+    threading.Thread(target=_reindex, args=(folder, index_dir), name="reindex", daemon=True).start()
+    return True
+
+
+def _watch_loop():
+    while True:
+        time.sleep(INDEX_WATCH_SECONDS)
+        current = snapshot
+        if current is None or reindex_state['running']:
+            continue
+        try:
+            changed = _source_signature(current.folder, current.index_dir) != current.source
+        except OSError as e:
+            logger.warning(f"Could not check {current.folder} for changes: {e}")
+            continue
+        if changed:
+            logger.info(f"{current.folder} or the index on disk changed, reindexing")
+            reindex_in_background(current.folder, current.index_dir)
+
+
+def _ensure_watcher():
+    # Started lazily so each forked worker runs its own (threads do not survive fork)
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch_loop, name="index-watcher", daemon=True)
+            _watcher.start()
+
+
+def is_ready():
+    return model is not None and snapshot is not None
+
+
+def get_similar_docs(query, k=RETRIEVAL_TOP_K, max_tokens=RETRIEVAL_MAX_TOKENS, mode=RETRIEVAL_MODE):
+    """
+    Return up to k passages relevant to query, keeping their combined
+    estimated size within max_tokens (None for no budget).
+
+    mode is hybrid (FAISS and BM25 rankings merged by reciprocal rank
+    fusion), vector or lexical. Until the embedding model has loaded, or if
+    embedding fails, queries are answered from BM25 alone.
+    Each result is a dict with text, file, start, end, score (the ranking
+    score of the mode used) and similarity (cosine, None if FAISS did not return it).
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}")
+    # Read the snapshot once: a reindex may swap it while this search runs
+    current = ensure_index()
+    if current.index.ntotal == 0 or k <= 0:
+        return []
+
+    if mode != "lexical" and model is None:
+        _start_model_load()
+        logger.info("Embedding model not loaded yet, using lexical retrieval")
+        mode = "lexical"
+
+    candidates = k if mode != "hybrid" else max(k, RETRIEVAL_CANDIDATES)
+    similarity = {}
+    if mode != "lexical":
+        try:
+            with timed("embed"):
+                vector = query_embedder.embed(query)
+        except Exception as e:
+            logger.warning(f"Query embedding failed ({e}), using lexical retrieval")
+            mode = "lexical"
+        else:
+            with timed("faiss_search"):
+                scores, ids = current.index.search(vector[None, :], candidates)
+            # ids are -1 when fewer than candidates passages are reachable
+            similarity = {int(i): float(s) for s, i in zip(scores[0], ids[0]) if i >= 0}
+
+    if mode != "vector":
+        with timed("bm25_search"):
+            lexical_scores, rows = current.lexical.search(query, candidates)
+
+    if mode == "vector":
+        ranked = list(similarity.items())
+    elif mode == "lexical":
+        ranked = list(zip(rows.tolist(), lexical_scores.tolist()))
+    else:
+        ranked = reciprocal_rank_fusion([list(similarity), rows.tolist()], RRF_K)
+
+    results = []
+    used_tokens = 0
+    for i, score in ranked[:k]:
+        text = current.texts[i]
+        tokens = estimate_tokens(text)
+        if max_tokens is not None and used_tokens + tokens > max_tokens:
+            continue
+        used_tokens += tokens
+        results.append({
+            "text": text,
+            "file": current.passages[i]["file"],
+            "start": current.passages[i]["start"],
+            "end": current.passages[i]["end"],
+            "score": float(score),
+            "similarity": similarity.get(i),
+        })
+    return results
 
-    embeddings = model.encode(doc_texts)
-    index.add(np.array(embeddings))
 
 def get_similar_doc(query):
-    q_embed = model.encode([query])
-    D, I = index.search(np.array(q_embed), k=1)
-    return doc_texts[I[0][0]]
+    results = get_similar_docs(query, k=1, max_tokens=None)
+    return results[0]["text"] if results else ""
+
+
+if __name__ == "__main__":
+    # Offline build step: python retriever.py [folder]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    with _build_lock(INDEX_DIR):
+        build_index(sys.argv[1] if len(sys.argv) > 1 else MEDICAL_DOCS_DIR)
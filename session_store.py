@@ -0,0 +1,178 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """
+    Consultation results kept between /upload and /generate_pdf.
+
+    Sessions are JSON-serializable dicts that expire ttl_seconds after they
+    are stored. pop() is an atomic get-and-delete, so a session is turned into
+    a report at most once even if two requests race for it. Backends without
+    native expiry run expire() on a background thread, started on first use
+    (and again in each forked worker).
+    """
+
+    expiry_interval = 60
+
+    def __init__(self, ttl_seconds=86400):
+        self.ttl_seconds = ttl_seconds
+        self._expiry_thread = None
+        self._expiry_lock = threading.Lock()
+
+    def put(self, session_id, data):
+        raise NotImplementedError
+
+    def get(self, session_id):
+        raise NotImplementedError
+
+    def pop(self, session_id):
+        raise NotImplementedError
+
+    def expire(self):
+        """
+        Drop expired sessions; returns how many were removed
+        """
+        return 0
+
+    def _ensure_expiry(self):
+        with self._expiry_lock:
+            if self._expiry_thread is None or not self._expiry_thread.is_alive():
+                self._expiry_thread = threading.Thread(target=self._expire_loop, name="session-expiry", daemon=True)
+                self._expiry_thread.start()
+
+    def _expire_loop(self):
+        while True:
+            time.sleep(self.expiry_interval)
+            try:
+                removed = self.expire()
+                if removed:
+                    logger.info(f"Expired {removed} abandoned session(s)")
+            except Exception as e:
+                logger.warning(f"Session expiry failed: {e}")
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process LRU with TTL; only suitable for a single worker process
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=1000):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id, data):
+        self._ensure_expiry()
+        with self._lock:
+            self._sessions[session_id] = (time.time() + self.ttl_seconds, data)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                evicted, _ = self._sessions.popitem(last=False)
+                logger.warning(f"Session store full, evicted session {evicted}")
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] < time.time():
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def pop(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._sessions.items() if expires < now]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in one SQLite file (WAL mode), shared by all worker processes on a host
+    """
+
+    def __init__(self, path, ttl_seconds=86400):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._connection = LocalConnection(path)
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def put(self, session_id, data):
+        self._ensure_expiry()
+        with self._connection() as db:
+            db.execute("INSERT OR REPLACE INTO sessions (session_id, data, expires) VALUES (?, ?, ?)",
+                       (session_id, json.dumps(data), time.time() + self.ttl_seconds))
+
+    def get(self, session_id):
+        row = self._connection().execute("SELECT data FROM sessions WHERE session_id = ? AND expires >= ?",
+                                         (session_id, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, session_id):
+        # DELETE ... RETURNING is a single statement, so two workers can't both get the row
+        with self._connection() as db:
+            row = db.execute("DELETE FROM sessions WHERE session_id = ? RETURNING data, expires",
+                             (session_id,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def expire(self):
+        with self._connection() as db:
+            return db.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions in Redis, using its native key expiry. client needs set(name,
+    value, ex=...), get(name) and getdel(name) (redis-py, or
+    bench.fakes.FakeRedis locally).
+    """
+
+    def __init__(self, client, ttl_seconds=86400, prefix="med-assistant:session:"):
+        super().__init__(ttl_seconds)
+        self.client = client
+        self.prefix = prefix
+
+    def put(self, session_id, data):
+        self.client.set(self.prefix + session_id, json.dumps(data), ex=self.ttl_seconds)
+
+    def get(self, session_id):
+        value = self.client.get(self.prefix + session_id)
+        return json.loads(value) if value is not None else None
+
+    def pop(self, session_id):
+        value = self.client.getdel(self.prefix + session_id)
+        return json.loads(value) if value is not None else None
+
+
+def make_session_store(backend, ttl_seconds=86400, max_entries=1000, sqlite_path=None, redis_url=None):
+    """
+    Build the store selected by backend: memory, sqlite or redis
+    """
+    if backend == "memory":
+        return MemorySessionStore(ttl_seconds, max_entries)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, ttl_seconds)
+    if backend == "redis":
+        import redis  # optional dependency, only needed for this backend
+        return RedisSessionStore(redis.Redis.from_url(redis_url), ttl_seconds)
+    raise ValueError(f"Unknown SESSION_STORE {backend!r}; expected memory, sqlite or redis")
@@ -0,0 +1,26 @@
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """
+    Hands out one SQLite connection per thread and process for a database
+    file shared by gunicorn workers. Connections are opened in WAL mode so
+    readers don't block the writer, and are never reused across a fork.
+    Call the instance to get the current thread's connection.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
@@ -6,6 +6,15 @@ document.addEventListener('DOMContentLoaded', function() {
     let recordingStream = null;
     let recordingTimeout = null;
     let currentSessionId = null;
+    let audioContext = null;
+    let upload = null;
+    
+    // Speech is recorded as 16 kHz mono Opus and sent in CHUNK_MS slices while
+    // recording continues, so little is left to upload when the doctor stops
+    const SAMPLE_RATE = 16000;
+    const AUDIO_BITS_PER_SECOND = 24000;
+    const CHUNK_MS = 5000;
+    const CHUNK_RETRIES = 5;
     
     const recordBtn = document.getElementById("recordBtn");
     const statusDiv = document.getElementById("status");
@@ -21,6 +30,202 @@ document.addEventListener('DOMContentLoaded', function() {
         return;
     }
     
+    const STAGE_LABELS = {
+        queued: "Waiting for a free worker...",
+        converting: "Converting audio...",
+        transcribing: "Transcribing conversation...",
+        retrieving: "Retrieving medical references...",
+        generating: "Generating prescription and report..."
+    };
+    
+    function showStage(job) {
+        statusDiv.textContent = STAGE_LABELS[job.stage] || "Processing audio...";
+    }
+    
+    function isFinished(job) {
+        return job.status === "done" || job.status === "failed";
+    }
+    
+    // Poll the job status endpoint until the job finishes
+    async function pollJob(statusUrl) {
+        while (true) {
+            const response = await fetch(statusUrl);
+            if (!response.ok) {
+                throw new Error(`Server error: ${response.status}`);
+            }
+            const job = await response.json();
+            showStage(job);
+            if (job.partial_report) {
+                resultDiv.textContent = job.partial_report;
+            }
+            if (isFinished(job)) {
+                return job;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+    
+    // Follow a queued job via Server-Sent Events, falling back to polling
+    function followJob(queued) {
+        if (!window.EventSource) {
+            return pollJob(queued.status_url);
+        }
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(queued.events_url);
+            let partialReport = "";
+            // Render the report as Gemini streams it
+            source.addEventListener("chunk", (e) => {
+                partialReport += JSON.parse(e.data).text;
+                resultDiv.textContent = partialReport;
+            });
+            source.onmessage = (e) => {
+                const job = JSON.parse(e.data);
+                showStage(job);
+                if (isFinished(job)) {
+                    source.close();
+                    resolve(job);
+                }
+            };
+            source.onerror = () => {
+                // Stream dropped (e.g. by a proxy timeout); keep following by polling
+                source.close();
+                pollJob(queued.status_url).then(resolve, reject);
+            };
+        });
+    }
+    
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+    
+    // Downmix and resample the microphone to a mono 16 kHz stream for MediaRecorder
+    function openSpeechStream(micStream) {
+        if (!window.AudioContext) {
+            return micStream;
+        }
+        let source;
+        try {
+            audioContext = new AudioContext({ sampleRate: SAMPLE_RATE });
+            source = audioContext.createMediaStreamSource(micStream);
+        } catch (error) {
+            // Some browsers can't connect a microphone running at another rate; record mono at its rate
+            console.warn(`Recording at the device sample rate: ${error.message}`);
+            if (audioContext) {
+                audioContext.close();
+            }
+            audioContext = new AudioContext();
+            source = audioContext.createMediaStreamSource(micStream);
+        }
+        const mono = audioContext.createGain();
+        mono.channelCount = 1;
+        mono.channelCountMode = "explicit";
+        mono.channelInterpretation = "speakers";
+        const destination = audioContext.createMediaStreamDestination();
+        destination.channelCount = 1;
+        source.connect(mono).connect(destination);
+        return destination.stream;
+    }
+    
+    function releaseAudio() {
+        if (recordingStream) {
+            recordingStream.getTracks().forEach(track => track.stop());
+            recordingStream = null;
+        }
+        if (audioContext) {
+            audioContext.close();
+            audioContext = null;
+        }
+    }
+    
+    // Start a chunked upload; null if the server doesn't accept one (the whole recording is sent at the end)
+    async function startUpload(mimeType) {
+        try {
+            const response = await fetch("/uploads", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ mime_type: mimeType }),
+            });
+            if (!response.ok) {
+                throw new Error(`Server error: ${response.status}`);
+            }
+            const created = await response.json();
+            return { id: created.upload_id, completeUrl: created.complete_url, pending: Promise.resolve() };
+        } catch (error) {
+            console.warn(`Chunked upload unavailable: ${error.message}`);
+            return null;
+        }
+    }
+    
+    // PUT one chunk, retrying network errors and 5xx responses with backoff
+    async function sendChunk(index, blob) {
+        let lastError;
+        for (let attempt = 0; attempt < CHUNK_RETRIES; attempt++) {
+            if (attempt > 0) {
+                await sleep(500 * 2 ** attempt);
+            }
+            let response;
+            try {
+                response = await fetch(`/uploads/${upload.id}/chunks/${index}`, { method: "PUT", body: blob });
+            } catch (error) {
+                lastError = error;
+                continue;
+            }
+            if (response.ok) {
+                return;
+            }
+            lastError = new Error(`Chunk upload failed: ${response.status}`);
+            if (response.status < 500) {
+                break;
+            }
+        }
+        throw lastError;
+    }
+    
+    // Chunks go out one at a time, in order; a failed one is re-sent when the upload completes
+    function queueChunk(index, blob) {
+        upload.pending = upload.pending
+            .then(() => sendChunk(index, blob))
+            .catch(error => console.warn(`Chunk ${index} not uploaded yet: ${error.message}`));
+    }
+    
+    // Finish the chunked upload, re-sending whatever the server reports missing
+    async function completeUpload() {
+        await upload.pending;
+        for (let attempt = 0; attempt < 3; attempt++) {
+            const response = await fetch(upload.completeUrl, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ chunks: audioChunks.length }),
+            });
+            if (response.status !== 409) {
+                if (!response.ok) {
+                    throw new Error(`Server error: ${response.status}`);
+                }
+                return response.json();
+            }
+            const { missing } = await response.json();
+            for (const index of missing) {
+                await sendChunk(index, audioChunks[index]);
+            }
+        }
+        throw new Error("Recording upload did not complete");
+    }
+    
+    // Send the whole recording in one request
+    async function uploadWhole(blob, fileName) {
+        const formData = new FormData();
+        formData.append("audio", blob, fileName);
+        console.log(`Sending audio file: ${fileName} with type: ${blob.type}`);
+        
+        const response = await fetch("/upload", {
+            method: "POST",
+            body: formData,
+        });
+        
+        if (!response.ok) {
+            throw new Error(`Server error: ${response.status}`);
+        }
+        return response.json();
+    }
+    
     // Function to stop recording
     function stopRecording() {
         if (mediaRecorder && mediaRecorder.state === "recording") {
@@ -48,7 +253,10 @@ document.addEventListener('DOMContentLoaded', function() {
             recordBtn.disabled = true;
             audioChunks = []; // Reset chunks
             
-            recordingStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+            recordingStream = await navigator.mediaDevices.getUserMedia({
+                audio: { channelCount: 1, sampleRate: SAMPLE_RATE, echoCancellation: true, noiseSuppression: true }
+            });
+            const speechStream = openSpeechStream(recordingStream);
             
             // Try to use a more compatible audio format
             let mimeType = 'audio/webm';
@@ -61,11 +269,18 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             console.log(`Using MIME type: ${mimeType}`);
-            mediaRecorder = new MediaRecorder(recordingStream, { mimeType: mimeType });
+            mediaRecorder = new MediaRecorder(speechStream, {
+                mimeType: mimeType,
+                audioBitsPerSecond: AUDIO_BITS_PER_SECOND
+            });
+            upload = await startUpload(mimeType);
             
             mediaRecorder.ondataavailable = (e) => {
                 if (e.data.size > 0) {
                     audioChunks.push(e.data);
+                    if (upload) {
+                        queueChunk(audioChunks.length - 1, e.data);
+                    }
                 }
             };
             
@@ -74,9 +289,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 statusDiv.textContent = "Processing audio...";
                 
                 try {
-                    const blob = new Blob(audioChunks, { type: mimeType });
-                    const formData = new FormData();
-                    
                     // Use appropriate file extension based on MIME type
                     let fileName = "recording.webm";
                     if (mimeType.includes('wav')) {
@@ -85,19 +297,18 @@ document.addEventListener('DOMContentLoaded', function() {
                         fileName = "recording.ogg";
                     }
                     
-                    formData.append("audio", blob, fileName);
-                    console.log(`Sending audio file: ${fileName} with type: ${mimeType}`);
-                    
-                    const response = await fetch("/upload", {
-                        method: "POST",
-                        body: formData,
-                    });
-                    
-                    if (!response.ok) {
-                        throw new Error(`Server error: ${response.status}`);
+                    let queued = null;
+                    if (upload) {
+                        try {
+                            queued = await completeUpload();
+                        } catch (error) {
+                            console.warn(`Chunked upload failed, sending the whole recording: ${error.message}`);
+                        }
                     }
-                    
-                    const result = await response.json();
+                    if (!queued) {
+                        queued = await uploadWhole(new Blob(audioChunks, { type: mimeType }), fileName);
+                    }
+                    const result = await followJob(queued);
                     
                     if (result.success) {
                         resultDiv.innerHTML = result.report.replace(/\n/g, '<br>');
@@ -108,7 +319,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         pdfSection.style.display = 'block';
                         pdfStatusDiv.textContent = '';
                     } else {
-                        throw new Error('Server returned error response');
+                        throw new Error(result.error || 'Server returned error response');
                     }
                 } catch (error) {
                     console.error("Upload error:", error);
@@ -117,12 +328,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 } finally {
                     recordBtn.disabled = false;
                     recordBtn.textContent = "🎤 Record Conversation";
+                    upload = null;
                     
                     // Stop all tracks to release microphone
-                    if (recordingStream) {
-                        recordingStream.getTracks().forEach(track => track.stop());
-                        recordingStream = null;
-                    }
+                    releaseAudio();
                 }
             };
             
@@ -132,15 +341,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 recordBtn.disabled = false;
                 recordBtn.textContent = "🎤 Record Conversation";
                 isRecording = false;
+                upload = null;
                 
                 // Clean up stream
-                if (recordingStream) {
-                    recordingStream.getTracks().forEach(track => track.stop());
-                    recordingStream = null;
-                }
+                releaseAudio();
             };
             
-            mediaRecorder.start();
+            mediaRecorder.start(CHUNK_MS);
             isRecording = true;
             recordBtn.disabled = false; // Enable button so it can be used to stop
             recordBtn.textContent = "⏹️ Stop Recording";
@@ -154,10 +361,7 @@ document.addEventListener('DOMContentLoaded', function() {
             isRecording = false;
             
             // Clean up stream in case of error
-            if (recordingStream) {
-                recordingStream.getTracks().forEach(track => track.stop());
-                recordingStream = null;
-            }
+            releaseAudio();
         }
     };
     
@@ -186,23 +390,28 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({
                     session_id: currentSessionId,
                     patient_name: patientName,
-                    doctor_name: doctorName
+                    doctor_name: doctorName,
+                    stream: true
                 }),
             });
             
-            const result = await response.json();
-            
-            if (result.success) {
-                pdfStatusDiv.innerHTML = `
-                    <span style="color: green;">✅ PDF generated successfully!</span><br>
-                    <a href="/download_pdf/${result.pdf_path}" download class="download-link">
-                        📥 Download PDF Report
-                    </a>
-                `;
-            } else {
+            // The PDF comes back in this response; errors are still JSON
+            if (!response.ok) {
+                const result = await response.json();
                 throw new Error(result.error || 'Failed to generate PDF');
             }
             
+            const blob = await response.blob();
+            const disposition = response.headers.get('Content-Disposition') || '';
+            const match = disposition.match(/filename="?([^";]+)"?/);
+            const filename = match ? match[1] : 'medical_report.pdf';
+            pdfStatusDiv.innerHTML = `
+                <span style="color: green;">✅ PDF generated successfully!</span><br>
+                <a href="${URL.createObjectURL(blob)}" download="${filename}" class="download-link">
+                    📥 Download PDF Report
+                </a>
+            `;
+            
         } catch (error) {
             console.error('PDF generation error:', error);
             pdfStatusDiv.textContent = `Error: ${error.message}`;
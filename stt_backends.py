@@ -0,0 +1,113 @@
+import json
+import logging
+import threading
+import numpy as np
+import speech_recognition as sr
+from config import (
+    STT_BACKEND, STT_WORKERS, VOSK_MODEL_PATH,
+    WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE, WHISPER_CPU_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechBackend:
+    """
+    Turns 16 kHz mono 16-bit sr.AudioData into text.
+
+    recognize() raises sr.UnknownValueError when there is no intelligible
+    speech and sr.RequestError when the engine is unavailable, like the
+    speech_recognition recognizers do. Local engines load their model once
+    (on warm_up() or first use) and share it between threads.
+    """
+
+    name = None
+
+    def __init__(self):
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def warm_up(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def recognize(self, audio_data):
+        raise NotImplementedError
+
+    def _load(self):
+        return None
+
+
+class GoogleBackend(SpeechBackend):
+    name = "google"
+
+    def _load(self):
+        return sr.Recognizer()
+
+    def recognize(self, audio_data):
+        return self.warm_up().recognize_google(audio_data, language='en-US')
+
+
+class VoskBackend(SpeechBackend):
+    name = "vosk"
+
+    def _load(self):
+        try:
+            import vosk
+        except ImportError:
+            raise sr.RequestError("The vosk backend needs 'pip install vosk'")
+        logger.info(f"Loading Vosk model from {VOSK_MODEL_PATH}")
+        vosk.SetLogLevel(-1)
+        return vosk.Model(VOSK_MODEL_PATH)
+
+    def recognize(self, audio_data):
+        import vosk
+        # The model is shared; recognizers are cheap and not thread-safe, so one per call
+        recognizer = vosk.KaldiRecognizer(self.warm_up(), audio_data.sample_rate)
+        recognizer.AcceptWaveform(audio_data.get_raw_data())
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FasterWhisperBackend(SpeechBackend):
+    name = "faster_whisper"
+
+    def _load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise sr.RequestError("The faster_whisper backend needs 'pip install faster-whisper'")
+        logger.info(f"Loading faster-whisper {WHISPER_MODEL_SIZE} ({WHISPER_COMPUTE_TYPE}) on CPU")
+        return WhisperModel(WHISPER_MODEL_SIZE, device="cpu", compute_type=WHISPER_COMPUTE_TYPE,
+                            cpu_threads=WHISPER_CPU_THREADS, num_workers=STT_WORKERS)
+
+    def recognize(self, audio_data):
+        samples = np.frombuffer(audio_data.get_raw_data(), dtype=np.int16).astype(np.float32) / 32768
+        segments, _ = self.warm_up().transcribe(samples, language="en", beam_size=1, vad_filter=False)
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+BACKENDS = {cls.name: cls for cls in (GoogleBackend, VoskBackend, FasterWhisperBackend)}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name=STT_BACKEND):
+    """
+    Process-wide backend instance for name, so its model is loaded only once
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend {name!r}, expected one of {sorted(BACKENDS)}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
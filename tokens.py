@@ -0,0 +1,5 @@
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English text)
+    """
+    return max(1, len(text) // 4)
@@ -1,101 +1,231 @@
 import speech_recognition as sr
 from pydub import AudioSegment
+from config import (
+    STT_MAX_CHUNK_SECONDS, STT_MIN_CHUNK_SECONDS, STT_MIN_SILENCE_MS,
+    STT_SILENCE_OFFSET_DB, STT_WORKERS, STT_RETRIES,
+)
+from stt_backends import get_backend
+from metrics import timed
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import io
 import os
+import time
+import wave
+import subprocess
 import logging
 
 logger = logging.getLogger(__name__)
 
-def transcribe_audio(path):
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+FRAME_MS = 30  # energy VAD frame length
+SILENCE_FLOOR_DBFS = -60  # quieter than this is silence however quiet the whole clip is
+
+# Shared across requests so concurrent jobs can't oversubscribe the STT service
+_chunk_pool = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+
+
+class NoSpeechError(Exception):
+    """The audio decoded fine but no speech could be recognized in it"""
+
+# Container signatures browsers' MediaRecorder (and common uploads) produce
+MIME_FORMATS = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/webm": "webm",
+    "video/webm": "webm",
+    "audio/ogg": "ogg",
+    "audio/mp4": "mp4",
+    "audio/mpeg": "mp3",
+    "audio/flac": "flac",
+}
+
+def sniff_format(data, mime_type=None):
     """
-    Transcribe audio file to text using Google Speech Recognition
+    Guess the container from magic bytes, falling back to the upload MIME type.
+    Returns an ffmpeg format name, or None to let ffmpeg probe the input.
     """
+    head = data[:12]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"  # EBML header; ffmpeg's webm demuxer also reads Matroska
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:3] == b"ID3" or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    if mime_type:
+        return MIME_FORMATS.get(mime_type.split(";")[0].strip().lower())
+    return None
+
+def _read_pcm_wav(data):
+    # Already 16 kHz mono 16-bit WAV: no decode needed
     try:
-        recognizer = sr.Recognizer()
-        
-        # Check if input file exists
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"Audio file not found: {path}")
-        
-        logger.info(f"Processing audio file: {path}")
-        
-        # Always convert to proper WAV format for speech recognition
-        temp_wav_path = "temp_converted.wav"
+        with wave.open(io.BytesIO(data)) as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+                return wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        pass
+    return None
+
+def decode_to_pcm(data, fmt=None):
+    """
+    Decode audio bytes to 16 kHz mono 16-bit PCM with a single ffmpeg pipe
+    """
+    if fmt == "wav":
+        pcm = _read_pcm_wav(data)
+        if pcm is not None:
+            return pcm
+
+    cmd = [AudioSegment.converter, "-hide_banner", "-loglevel", "error"]
+    if fmt:
+        cmd += ["-f", fmt]
+    cmd += ["-i", "pipe:0", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-acodec", "pcm_s16le", "pipe:1"]
+    process = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg could not decode {fmt or 'audio'}: {process.stderr.decode(errors='replace').strip()}")
+    return process.stdout
+
+def split_on_silence(pcm, max_chunk_seconds=STT_MAX_CHUNK_SECONDS, min_chunk_seconds=STT_MIN_CHUNK_SECONDS,
+                     min_silence_ms=STT_MIN_SILENCE_MS, silence_offset_db=STT_SILENCE_OFFSET_DB):
+    """
+    Segment 16 kHz mono PCM into chunks of at most max_chunk_seconds, cutting
+    in the middle of pauses where possible. Silence is any frame quieter than
+    the clip's overall level minus silence_offset_db (or below
+    SILENCE_FLOOR_DBFS). Chunks with no speech
+    at all are dropped. Returns a list of (start, end) byte offsets.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return [(0, len(pcm))] if len(pcm) else []
+
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    frame_db = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) / 32768 + 1e-10)
+    overall_db = 20 * np.log10(np.sqrt(np.mean(frames ** 2)) / 32768 + 1e-10)
+    voiced = frame_db > max(overall_db - silence_offset_db, SILENCE_FLOOR_DBFS)
+
+    # Candidate cut points: centres of pauses at least min_silence_ms long
+    cuts = []
+    min_run = max(1, min_silence_ms // FRAME_MS)
+    run_start = None
+    for i, is_voiced in enumerate(np.append(voiced, True)):
+        if not is_voiced and run_start is None:
+            run_start = i
+        elif is_voiced and run_start is not None:
+            if i - run_start >= min_run:
+                cuts.append((run_start + i) // 2)
+            run_start = None
+
+    max_frames = max(1, int(max_chunk_seconds * 1000 / FRAME_MS))
+    min_frames = int(min_chunk_seconds * 1000 / FRAME_MS)
+    bounds = []
+    start = 0
+    while n_frames - start > max_frames:
+        window = [c for c in cuts if start + min_frames < c <= start + max_frames]
+        end = window[-1] if window else start + max_frames
+        bounds.append((start, end))
+        start = end
+    bounds.append((start, n_frames))
+
+    frame_bytes = frame_len * SAMPLE_WIDTH
+    chunks = []
+    for first, last in bounds:
+        if voiced[first:last].any():
+            end = len(pcm) if last == n_frames else last * frame_bytes
+            chunks.append((first * frame_bytes, end))
+    return chunks
+
+def _recognize_chunk(recognize, pcm):
+    audio_data = sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
+    for attempt in range(STT_RETRIES + 1):
         try:
-            # Try to load the audio file with pydub (supports many formats)
-            logger.info("Loading audio file with pydub...")
-            
-            # Try different format assumptions since browser MediaRecorder can produce various formats
-            sound = None
-            formats_to_try = [None, "webm", "ogg", "mp4", "wav"]
-            
-            for fmt in formats_to_try:
-                try:
-                    if fmt is None:
-                        sound = AudioSegment.from_file(path)
-                        logger.info("Successfully loaded audio with auto-detection")
-                    else:
-                        sound = AudioSegment.from_file(path, format=fmt)
-                        logger.info(f"Successfully loaded audio as {fmt} format")
-                    break
-                except Exception as format_error:
-                    logger.warning(f"Failed to load as {fmt or 'auto'}: {format_error}")
-                    continue
-            
-            if sound is None:
-                raise Exception("Could not load audio file in any supported format")
-            
-            # Convert to mono, 16kHz, 16-bit WAV (optimal for speech recognition)
-            logger.info("Converting audio to optimal format for speech recognition...")
-            sound = sound.set_channels(1)  # Convert to mono
-            sound = sound.set_frame_rate(16000)  # Set sample rate to 16kHz
-            sound = sound.set_sample_width(2)  # Set to 16-bit
-            
-            # Export as WAV
-            sound.export(temp_wav_path, format="wav")
-            logger.info(f"Audio successfully converted to WAV format: {temp_wav_path}")
-            
+            return recognize(audio_data)
+        except sr.UnknownValueError:
+            return ""  # no intelligible speech in this chunk
+        except sr.RequestError as e:
+            if attempt == STT_RETRIES:
+                raise
+            delay = 0.5 * 2 ** attempt
+            logger.warning(f"Chunk recognition failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def transcribe_pcm(pcm, recognize=None):
+    """
+    Transcribe 16 kHz mono PCM, recognizing silence-separated chunks concurrently
+    and joining their text in order. recognize(audio_data) -> str defaults to
+    the configured STT_BACKEND and may raise sr.UnknownValueError / sr.RequestError.
+    """
+    recognize = recognize or get_backend().recognize
+    chunks = split_on_silence(pcm)
+    logger.info(f"Recognizing {len(chunks)} audio chunk(s)")
+    if len(chunks) == 1:
+        texts = [_recognize_chunk(recognize, pcm[chunks[0][0]:chunks[0][1]])]
+    else:
+        texts = list(_chunk_pool.map(lambda bounds: _recognize_chunk(recognize, pcm[bounds[0]:bounds[1]]), chunks))
+
+    text = " ".join(t.strip() for t in texts if t and t.strip())
+    if not text:
+        raise sr.UnknownValueError()
+    return text
+
+def transcribe_audio(audio, mime_type=None, on_stage=None, recognize=None):
+    """
+    Transcribe audio to text with the configured speech backend (or recognize, if given).
+    audio is the uploaded file's bytes (or a path to read them from); it is
+    decoded in memory and never written back to disk.
+    on_stage, if given, is called with "transcribing" once decoding is done.
+    """
+    try:
+        if isinstance(audio, (str, os.PathLike)):
+            # Check if input file exists
+            if not os.path.exists(audio):
+                raise FileNotFoundError(f"Audio file not found: {audio}")
+            with open(audio, 'rb') as f:
+                audio = f.read()
+
+        fmt = sniff_format(audio, mime_type)
+        logger.info(f"Processing {len(audio)} bytes of {fmt or 'unknown format'} audio")
+
+        # Decode once to mono, 16kHz, 16-bit PCM (optimal for speech recognition)
+        try:
+            with timed("decode"):
+                pcm = decode_to_pcm(audio, fmt)
+            logger.info(f"Decoded {len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH):.1f}s of audio")
         except Exception as e:
             logger.error(f"Audio conversion failed: {e}")
             raise Exception(f"Could not process audio file. Error: {str(e)}")
-        
-        # Transcribe audio using the converted WAV file
+
+        if on_stage:
+            on_stage("transcribing")
+
         try:
-            logger.info("Starting speech recognition...")
-            with sr.AudioFile(temp_wav_path) as source:
-                # Adjust for ambient noise
-                logger.info("Adjusting for ambient noise...")
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                
-                # Record the audio
-                logger.info("Recording audio for transcription...")
-                audio = recognizer.record(source)
-            
-            # Use Google Speech Recognition
-            logger.info("Calling Google Speech Recognition API...")
-            text = recognizer.recognize_google(audio, language='en-US')
-            logger.info(f"Transcription successful: {text}")
-            
+            with timed("stt"):
+                text = transcribe_pcm(pcm, recognize)
+            # Length only: transcripts are patient data and stay out of the logs
+            logger.info(f"Transcription successful: {len(text.split())} words")
+
             return text
-            
+
         except sr.UnknownValueError:
             logger.warning("Speech recognition could not understand audio")
-            raise Exception("Could not understand the audio. Please try speaking more clearly or check if audio contains speech.")
+            raise NoSpeechError("Could not understand the audio. Please try speaking more clearly or check if audio contains speech.")
         except sr.RequestError as e:
             logger.error(f"Speech recognition service error: {e}")
             raise Exception("Speech recognition service is unavailable. Please check your internet connection and try again.")
         except Exception as e:
             logger.error(f"Error during speech recognition: {e}")
             raise Exception(f"Speech recognition failed: {str(e)}")
-        
+
+    except NoSpeechError:
+        raise
     except Exception as e:
         logger.error(f"Error transcribing audio: {e}")
         raise Exception(f"Audio processing failed: {str(e)}")
-    
-    finally:
-        # Clean up temporary files
-        try:
-            if 'temp_wav_path' in locals() and temp_wav_path != path and os.path.exists(temp_wav_path):
-                os.remove(temp_wav_path)
-                logger.info("Temporary audio file cleaned up")
-        except Exception as cleanup_error:
-            logger.warning(f"Could not clean up temporary file: {cleanup_error}")
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+MAX_CHUNKS = 100000
+# Missing chunk indices listed in one 409 response; the client re-sends them and completes again
+MAX_MISSING_REPORTED = 100
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class ChunkedUploadStore:
+    """
+    Recordings uploaded in pieces while they are being recorded.
+
+    Each upload is a directory holding one file per numbered chunk. Writing a
+    chunk is idempotent, so a client that lost a response simply sends the
+    chunk again, and status() tells a reconnecting client which chunks
+    arrived. The directory lives on local disk, so gunicorn workers on the
+    same host can receive chunks of the same upload. Uploads not completed
+    within ttl_seconds are removed.
+    """
+
+    expiry_interval = 60
+
+    def __init__(self, directory, ttl_seconds=3600, max_bytes=100 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._last_expiry = 0.0
+        self._expiry_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, upload_id):
+        if not UPLOAD_ID_RE.match(upload_id or ""):
+            raise UploadError("Upload not found", 404)
+        path = os.path.join(self.directory, upload_id)
+        if not os.path.isdir(path):
+            raise UploadError("Upload not found", 404)
+        return path
+
+    def _meta(self, path):
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            return json.load(f)
+
+    def create(self, mime_type=None):
+        if mime_type is not None and not isinstance(mime_type, str):
+            raise UploadError("mime_type must be a string")
+        self._maybe_expire()
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, upload_id)
+        os.makedirs(path)
+        with open(os.path.join(path, "meta.json"), 'w') as f:
+            json.dump({"mime_type": mime_type, "created": time.time()}, f)
+        return upload_id
+
+    def put_chunk(self, upload_id, index, data):
+        """
+        Store chunk index (0-based), replacing any earlier copy. Returns the upload's status().
+        """
+        path = self._path(upload_id)
+        if not 0 <= index < MAX_CHUNKS:
+            raise UploadError(f"Chunk index must be between 0 and {MAX_CHUNKS - 1}")
+        if self._received_bytes(path) + len(data) > self.max_bytes:
+            raise UploadError("Recording is too large", 413)
+        chunk_path = os.path.join(path, f"{index:06d}.part")
+        # Written aside and renamed, so a concurrent complete() never reads half a chunk
+        tmp_path = f"{chunk_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, chunk_path)
+        except FileNotFoundError:
+            # Completed or expired while the chunk was arriving
+            raise UploadError("Upload not found", 404)
+        return self.status(upload_id)
+
+    def _chunks(self, path):
+        return sorted(int(name[:-5]) for name in os.listdir(path) if name.endswith(".part"))
+
+    def _received_bytes(self, path):
+        return sum(os.path.getsize(os.path.join(path, f"{i:06d}.part")) for i in self._chunks(path))
+
+    def status(self, upload_id):
+        path = self._path(upload_id)
+        return {
+            "upload_id": upload_id,
+            "received": self._chunks(path),
+            "bytes": self._received_bytes(path),
+        }
+
+    def complete(self, upload_id, total_chunks):
+        """
+        Join chunks 0..total_chunks-1 and remove the upload. Returns (bytes, mime_type).
+        Raises UploadError (409, with up to MAX_MISSING_REPORTED of the missing
+        indices) if any chunk has not arrived.
+        """
+        if not 0 < total_chunks <= MAX_CHUNKS:
+            raise UploadError(f"chunks must be between 1 and {MAX_CHUNKS}")
+        path = self._path(upload_id)
+        try:
+            received = set(self._chunks(path))
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        if sum(1 for i in received if i < total_chunks) < total_chunks:
+            missing = []
+            for i in range(total_chunks):
+                if i not in received:
+                    missing.append(i)
+                    if len(missing) == MAX_MISSING_REPORTED:
+                        break
+            raise UploadError("Some chunks have not been received", 409, missing=missing)
+
+        # Claimed by renaming, so only one of two concurrent complete() calls gets the recording
+        claimed = f"{path}.{uuid.uuid4().hex}.completing"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        try:
+            parts = []
+            for i in range(total_chunks):
+                with open(os.path.join(claimed, f"{i:06d}.part"), 'rb') as f:
+                    parts.append(f.read())
+            mime_type = self._meta(claimed).get("mime_type")
+        except OSError:
+            # Hand the upload back so the client can retry
+            os.rename(claimed, path)
+            raise
+        shutil.rmtree(claimed, ignore_errors=True)
+        return b"".join(parts), mime_type
+
+    def expire(self):
+        """
+        Remove uploads older than ttl_seconds; returns how many were removed
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            # Also catches uploads left claimed by a complete() that never finished
+            if UPLOAD_ID_RE.match(name.split(".", 1)[0]) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _maybe_expire(self):
+        # Run from create() at most once per expiry_interval; no thread needed
+        with self._expiry_lock:
+            if time.time() - self._last_expiry < self.expiry_interval:
+                return
+            self._last_expiry = time.time()
+        try:
+            removed = self.expire()
+            if removed:
+                logger.info(f"Removed {removed} abandoned upload(s)")
+        except OSError as e:
+            logger.warning(f"Upload expiry failed: {e}")
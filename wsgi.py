@@ -0,0 +1,25 @@
+"""
+Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (the default in gunicorn.conf.py) this module is imported
+once in the gunicorn master. Warming up here, before the workers are forked,
+loads the embedding model, memory-maps the FAISS index and creates the Gemini
+client a single time; the workers then share those pages copy-on-write
+instead of each loading its own copy.
+"""
+import gc
+import logging
+
+from app import app, warm_up, warmup_state
+from config import WARMUP_ON_START
+
+logger = logging.getLogger(__name__)
+
+if WARMUP_ON_START:
+    warm_up()
+    if warmup_state['error']:
+        logger.warning("Warm-up failed in the master; workers will load models lazily")
+
+# Move everything allocated so far out of the collector's generations, so GC
+# passes in the workers don't touch (and so copy) the shared objects' pages
+gc.freeze()